@@ -3,19 +3,36 @@ Audit Logging and Security Alerts for Auth Service
 Tracks security events and sends alerts for critical issues
 """
 import os
-import json
+import asyncio
+import logging
+import time
 import httpx
+import orjson
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from enum import Enum
 
+from database import truncate
+
+logger = logging.getLogger("auth.audit")
+
 # Configuration
 ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
 ALERT_THRESHOLD_FAILED_LOGINS = 5
 ALERT_THRESHOLD_RATE_LIMIT = 10
+ALERT_WINDOW_SECONDS = 60
+ALERT_MAX_TRACKED_IPS = 10000
+
+# Alert dispatcher configuration
+ALERT_QUEUE_SIZE = 1024
+ALERT_BATCH_SIZE = 32
+ALERT_FLUSH_INTERVAL_MS = 200
+ALERT_MAX_RETRIES = 3
+ALERT_RETRY_BACKOFF_SECONDS = 0.5
 
 class EventType(str, Enum):
-    """Security event types"""
+    """Security event types (members are str, so they bind directly in SQL)"""
     LOGIN_SUCCESS = "LOGIN_SUCCESS"
     LOGIN_FAILED = "LOGIN_FAILED"
     LOGOUT = "LOGOUT"
@@ -75,6 +92,24 @@ EVENT_SEVERITY = {
     EventType.CONFIG_CHANGED: Severity.WARNING,
 }
 
+# Alert colors for severity levels
+SEVERITY_COLORS = {
+    Severity.DEBUG: "#808080",
+    Severity.INFO: "#2196F3",
+    Severity.WARNING: "#FF9800",
+    Severity.ERROR: "#F44336",
+    Severity.CRITICAL: "#9C27B0",
+}
+
+# Precomputed (severity, color) per event type
+_EVENT_META = {
+    event: (severity, SEVERITY_COLORS[severity])
+    for event, severity in EVENT_SEVERITY.items()
+}
+_DEFAULT_EVENT_META = (Severity.INFO, SEVERITY_COLORS[Severity.INFO])
+_DEFAULT_ALERT_META = (Severity.WARNING, SEVERITY_COLORS[Severity.WARNING])
+
+
 # Events that should trigger alerts
 ALERT_EVENTS = {
     EventType.SUSPICIOUS_ACTIVITY,
@@ -85,13 +120,184 @@ ALERT_EVENTS = {
 }
 
 
+class SlidingWindowCounter:
+    """
+    Approximate per-key event count over the last `window_seconds`.
+    Keeps only a previous and a current bucket, weighting the previous one
+    by how much of it still overlaps the window. Memory is bounded to the
+    keys seen in the last two windows, capped at `max_keys` (LRU eviction).
+    """
+    
+    def __init__(self, window_seconds: float = ALERT_WINDOW_SECONDS, max_keys: int = ALERT_MAX_TRACKED_IPS):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._prev: Dict[str, int] = {}
+        self._curr: "OrderedDict[str, int]" = OrderedDict()
+        self._curr_start = time.monotonic()
+    
+    def _rotate(self, now: float):
+        """Advance buckets if the current window has elapsed"""
+        elapsed = now - self._curr_start
+        if elapsed < self.window_seconds:
+            return
+        # After two full windows nothing in the previous bucket overlaps anymore
+        self._prev = dict(self._curr) if elapsed < 2 * self.window_seconds else {}
+        self._curr = OrderedDict()
+        self._curr_start = now - (elapsed % self.window_seconds)
+    
+    def incr(self, key: str) -> float:
+        """Record one event for key and return the updated windowed count"""
+        now = time.monotonic()
+        self._rotate(now)
+        self._curr[key] = self._curr.get(key, 0) + 1
+        self._curr.move_to_end(key)
+        if len(self._curr) > self.max_keys:
+            evicted, _ = self._curr.popitem(last=False)
+            self._prev.pop(evicted, None)
+        return self._count(key, now)
+    
+    def count(self, key: str) -> float:
+        """Get windowed count for key"""
+        now = time.monotonic()
+        self._rotate(now)
+        return self._count(key, now)
+    
+    def _count(self, key: str, now: float) -> float:
+        weight = 1 - (now - self._curr_start) / self.window_seconds
+        return self._curr.get(key, 0) + self._prev.get(key, 0) * weight
+    
+    def reset(self, key: str):
+        """Forget all events for key"""
+        self._curr.pop(key, None)
+        self._prev.pop(key, None)
+
+
+class _AlertDispatcher:
+    """
+    Batches webhook alerts and posts them from a background task.
+    Enqueueing never blocks the caller; bursts are coalesced into one request.
+    """
+    
+    def __init__(self, webhook_url: str):
+        self.webhook_url = webhook_url
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        """Start the background worker on the running event loop"""
+        if self._task is not None or not self.webhook_url:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=ALERT_QUEUE_SIZE)
+        self._client = httpx.AsyncClient(timeout=5.0)
+        self._task = asyncio.create_task(self._worker())
+    
+    async def stop(self):
+        """Flush pending alerts and stop the background worker"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            await self._post(pending)
+        
+        await self._client.aclose()
+        self._task = None
+        self._loop = None
+    
+    def enqueue(self, payload: Dict[str, Any]) -> bool:
+        """Queue an alert payload without blocking. Returns False if not running."""
+        if self._loop is None or self._loop.is_closed():
+            return False
+        
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        
+        if running_loop is self._loop:
+            self._put(payload)
+        else:
+            # Called from a sync dependency running in the threadpool
+            self._loop.call_soon_threadsafe(self._put, payload)
+        return True
+    
+    def _put(self, payload: Dict[str, Any]):
+        """Put payload on the queue, dropping the oldest alert on overflow"""
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(payload)
+    
+    async def _worker(self):
+        """Drain the queue in batches of up to ALERT_BATCH_SIZE alerts"""
+        flush_interval = ALERT_FLUSH_INTERVAL_MS / 1000
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + flush_interval
+            
+            while len(batch) < ALERT_BATCH_SIZE:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            await self._post(batch)
+    
+    async def _post(self, batch: List[Dict[str, Any]]):
+        """Send a batch as a single Slack/Discord compatible message, with retries"""
+        if len(batch) == 1:
+            payload = batch[0]
+        else:
+            payload = {
+                "text": "\n".join(p["text"] for p in batch),
+                "attachments": [a for p in batch for a in p.get("attachments", [])]
+            }
+        
+        body = orjson.dumps(payload)
+        for attempt in range(ALERT_MAX_RETRIES):
+            try:
+                response = await self._client.post(
+                    self.webhook_url,
+                    content=body,
+                    headers={"Content-Type": "application/json"}
+                )
+                response.raise_for_status()
+                return
+            except Exception as e:
+                if attempt == ALERT_MAX_RETRIES - 1:
+                    logger.error("Failed to send %d alert(s): %s", len(batch), e)
+                    return
+                await asyncio.sleep(ALERT_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+
 class AuditLogger:
     """Audit logger with database persistence and alerting"""
     
     def __init__(self, db_module):
         self.db = db_module
-        self._failed_login_counts: Dict[str, int] = {}
-        self._rate_limit_counts: Dict[str, int] = {}
+        self._failed_logins = SlidingWindowCounter()
+        self._rate_limits = SlidingWindowCounter()
+        self._dispatcher = _AlertDispatcher(ALERT_WEBHOOK_URL)
+    
+    async def start(self):
+        """Start background alert delivery (call from app startup)"""
+        await self._dispatcher.start()
+    
+    async def shutdown(self):
+        """Flush queued alerts (call from app shutdown)"""
+        await self._dispatcher.stop()
     
     def log(
         self,
@@ -105,30 +311,33 @@ class AuditLogger:
     ):
         """Log a security event"""
         if severity is None:
-            severity = EVENT_SEVERITY.get(event_type, Severity.INFO)
+            severity = _EVENT_META.get(event_type, _DEFAULT_EVENT_META)[0]
         
         # Prepare details JSON
-        details_json = json.dumps(details) if details else None
+        details_json = orjson.dumps(details).decode() if details else None
         
         # Store in database
         try:
             self.db.create_audit_log(
-                event_type=event_type.value,
+                event_type=event_type,
                 user_id=user_id,
                 email=email,
                 ip_address=ip_address,
-                user_agent=user_agent[:500] if user_agent else None,
+                user_agent=truncate(user_agent or None),
                 details=details_json,
-                severity=severity.value
+                severity=severity
             )
         except Exception as e:
-            print(f"Failed to write audit log: {e}")
+            logger.error("Failed to write audit log: %s", e)
         
         # Check for alert conditions
         self._check_alerts(event_type, email, ip_address, details)
         
-        # Print to console for debugging
-        print(f"[AUDIT] {datetime.now().isoformat()} | {severity.value.upper()} | {event_type.value} | {email or 'anonymous'} | {ip_address}")
+        # Log to console for debugging (formatted only if INFO is enabled)
+        logger.info(
+            "[AUDIT] %s | %s | %s | %s",
+            severity.value.upper(), event_type.value, email or 'anonymous', ip_address
+        )
     
     def _check_alerts(
         self,
@@ -152,20 +361,20 @@ class AuditLogger:
         
         # Failed login threshold
         if event_type == EventType.LOGIN_FAILED and ip_address:
-            self._failed_login_counts[ip_address] = self._failed_login_counts.get(ip_address, 0) + 1
-            if self._failed_login_counts[ip_address] >= ALERT_THRESHOLD_FAILED_LOGINS:
+            count = self._failed_logins.incr(ip_address)
+            if count >= ALERT_THRESHOLD_FAILED_LOGINS:
                 should_alert = True
-                alert_message = f"Multiple failed logins ({self._failed_login_counts[ip_address]}) from IP: {ip_address}"
+                alert_message = f"Multiple failed logins ({int(count)}) in {ALERT_WINDOW_SECONDS}s from IP: {ip_address}"
                 # Reset counter after alert
-                self._failed_login_counts[ip_address] = 0
+                self._failed_logins.reset(ip_address)
         
         # Rate limit threshold
         if event_type == EventType.RATE_LIMIT_EXCEEDED and ip_address:
-            self._rate_limit_counts[ip_address] = self._rate_limit_counts.get(ip_address, 0) + 1
-            if self._rate_limit_counts[ip_address] >= ALERT_THRESHOLD_RATE_LIMIT:
+            count = self._rate_limits.incr(ip_address)
+            if count >= ALERT_THRESHOLD_RATE_LIMIT:
                 should_alert = True
-                alert_message = f"Repeated rate limiting ({self._rate_limit_counts[ip_address]}) from IP: {ip_address}"
-                self._rate_limit_counts[ip_address] = 0
+                alert_message = f"Repeated rate limiting ({int(count)}) in {ALERT_WINDOW_SECONDS}s from IP: {ip_address}"
+                self._rate_limits.reset(ip_address)
         
         if should_alert:
             self._send_alert(alert_message, event_type, details)
@@ -176,21 +385,21 @@ class AuditLogger:
         event_type: EventType,
         details: Optional[Dict] = None
     ):
-        """Send alert via webhook"""
+        """Queue alert for background webhook delivery"""
         if not ALERT_WEBHOOK_URL:
-            print(f"[ALERT] {message}")
+            logger.warning("[ALERT] %s", message)
             return
         
         try:
-            severity = EVENT_SEVERITY.get(event_type, Severity.WARNING)
+            severity, color = _EVENT_META.get(event_type, _DEFAULT_ALERT_META)
             
             # Format for Slack/Discord compatible webhook
             payload = {
                 "text": f"🚨 **Security Alert** - {message}",
                 "attachments": [{
-                    "color": self._severity_color(severity),
+                    "color": color,
                     "fields": [
-                        {"title": "Event", "value": event_type.value, "short": True},
+                        {"title": "Event", "value": event_type, "short": True},
                         {"title": "Severity", "value": severity.value.upper(), "short": True},
                         {"title": "Time", "value": datetime.now().isoformat(), "short": True},
                     ]
@@ -200,27 +409,16 @@ class AuditLogger:
             if details:
                 payload["attachments"][0]["fields"].append({
                     "title": "Details",
-                    "value": json.dumps(details, indent=2)[:1000],
+                    "value": orjson.dumps(details, option=orjson.OPT_INDENT_2).decode()[:1000],
                     "short": False
                 })
             
-            # Send async in background (fire and forget)
-            with httpx.Client(timeout=5.0) as client:
-                client.post(ALERT_WEBHOOK_URL, json=payload)
+            # Fire and forget: the dispatcher batches and posts in the background
+            if not self._dispatcher.enqueue(payload):
+                logger.warning("[ALERT] %s", message)
         
         except Exception as e:
-            print(f"Failed to send alert: {e}")
-    
-    def _severity_color(self, severity: Severity) -> str:
-        """Get color for severity level"""
-        colors = {
-            Severity.DEBUG: "#808080",
-            Severity.INFO: "#2196F3",
-            Severity.WARNING: "#FF9800",
-            Severity.ERROR: "#F44336",
-            Severity.CRITICAL: "#9C27B0",
-        }
-        return colors.get(severity, "#808080")
+            logger.error("Failed to queue alert: %s", e)
     
     def get_recent_events(
         self,
@@ -232,15 +430,15 @@ class AuditLogger:
         """Get recent audit events"""
         return self.db.get_audit_logs(
             limit=limit,
-            event_type=event_type.value if event_type else None,
+            event_type=event_type,
             user_id=user_id,
-            severity=severity.value if severity else None
+            severity=severity
         )
     
     def get_failed_login_count(self, ip_address: str, minutes: int = 60) -> int:
         """Get failed login count for IP in last N minutes"""
         return self.db.count_events_by_ip(
             ip_address=ip_address,
-            event_type=EventType.LOGIN_FAILED.value,
+            event_type=EventType.LOGIN_FAILED,
             minutes=minutes
         )
@@ -4,12 +4,62 @@ SQLite database for user management, sessions, 2FA, and audit logs
 """
 import sqlite3
 import os
-from datetime import datetime, timedelta
-from typing import Optional, List
+import atexit
+import itertools
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
 from contextlib import contextmanager
 
+logger = logging.getLogger("auth.database")
+
 DATABASE_PATH = os.getenv("DATABASE_PATH", "/app/data/auth.db")
 
+# Bump when _create_schema changes so existing databases get migrated
+SCHEMA_VERSION = 2
+
+# Connection tuning applied once per cached connection
+CONNECTION_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "cache_size=-20000",
+)
+
+# Audit logs are partitioned into one table per (UTC) month
+AUDIT_RETENTION_DAYS = 90
+
+# Audit log writer batching
+AUDIT_QUEUE_SIZE = 4096
+AUDIT_BATCH_SIZE = 64
+AUDIT_FLUSH_INTERVAL_SECONDS = 0.1
+
+# Per-connection compiled statement cache size
+CACHED_STATEMENTS = 256
+
+# Hot read queries, kept as constants so every call hits the statement cache
+SQL_GET_USER_BY_EMAIL = "SELECT * FROM users WHERE email = ?"
+SQL_GET_USER_BY_ID = "SELECT * FROM users WHERE id = ?"
+SQL_GET_SESSION = """SELECT s.*, u.email, u.name, u.role, u.picture, u.totp_enabled
+               FROM sessions s 
+               JOIN users u ON s.user_id = u.id 
+               WHERE s.session_id = ? AND s.expires_at > ?"""
+
+# In-process session cache (bounds staleness of role/2FA changes)
+SESSION_CACHE_TTL_SECONDS = 30
+SESSION_CACHE_MAX_SIZE = 10000
+
+# Granularity of the cached "now" used in SQL comparisons
+NOW_CACHE_SECONDS = 1.0
+
+_local = threading.local()
+_connections: List[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+
 
 def get_db_path():
     """Get database path, creating directory if needed"""
@@ -19,80 +69,124 @@ def get_db_path():
     return DATABASE_PATH
 
 
+def truncate(value: Optional[str], max_length: int = 500) -> Optional[str]:
+    """Truncate value to max_length, without copying when it already fits"""
+    if value is None or len(value) <= max_length:
+        return value
+    return value[:max_length]
+
+
+_cached_now: Tuple[float, datetime] = (float("-inf"), datetime.min)
+
+
+def _now() -> datetime:
+    """Current time, refreshed at most once per NOW_CACHE_SECONDS"""
+    global _cached_now
+    tick = time.monotonic()
+    if tick - _cached_now[0] >= NOW_CACHE_SECONDS:
+        _cached_now = (tick, datetime.now())
+    return _cached_now[1]
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Get this thread's long-lived connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(
+            get_db_path(), check_same_thread=False, cached_statements=CACHED_STATEMENTS
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(f"PRAGMA {pragma}")
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
 @contextmanager
 def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
+    """Context manager for database connections (reuses a per-thread connection)"""
+    conn = _get_conn()
     try:
         yield conn
-    finally:
-        conn.close()
+    except BaseException:
+        # Don't leave a half-finished transaction on the shared connection
+        conn.rollback()
+        raise
+
+
+@atexit.register
+def close_connections():
+    """Close all cached connections"""
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    """Create tables and indexes, then stamp the schema version"""
+    # Users table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            name TEXT,
+            picture TEXT,
+            role TEXT DEFAULT 'user',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            totp_secret TEXT,
+            totp_enabled BOOLEAN DEFAULT FALSE,
+            backup_codes TEXT
+        )
+    """)
+    
+    # Sessions table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT,
+            is_2fa_verified BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    
+    # Create indexes for performance
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_session_id ON sessions(session_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)")
+    
+    # Audit logs: monthly partition tables behind an audit_logs view
+    _migrate_unpartitioned_audit_logs(conn)
+    _ensure_audit_partition(conn, _audit_partition_name(datetime.utcnow()))
+    
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+    
+    # Refresh planner statistics so the composite indexes get picked
+    conn.execute("ANALYZE")
 
 
 def init_db():
     """Initialize database with required tables"""
     with get_db() as conn:
-        # Users table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                name TEXT,
-                picture TEXT,
-                role TEXT DEFAULT 'user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                totp_secret TEXT,
-                totp_enabled BOOLEAN DEFAULT FALSE,
-                backup_codes TEXT
-            )
-        """)
-        
-        # Sessions table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT UNIQUE NOT NULL,
-                user_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL,
-                ip_address TEXT,
-                user_agent TEXT,
-                is_2fa_verified BOOLEAN DEFAULT FALSE,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
+        # Skip the DDL on warm starts: user_version is stamped once the schema is current
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            _create_schema(conn)
         
-        # Audit logs table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS audit_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                event_type TEXT NOT NULL,
-                user_id INTEGER,
-                email TEXT,
-                ip_address TEXT,
-                user_agent TEXT,
-                details TEXT,
-                severity TEXT DEFAULT 'info'
-            )
-        """)
-        
-        # Create indexes for performance
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_session_id ON sessions(session_id)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_logs(timestamp)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_event_type ON audit_logs(event_type)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_ip ON audit_logs(ip_address)")
-        
-        conn.commit()
-    
-    # Create admin user if ADMIN_EMAIL is set and no admins exist
-    admin_email = os.getenv("ADMIN_EMAIL")
-    if admin_email:
-        with get_db() as conn:
+        # Create admin user if ADMIN_EMAIL is set and no admins exist
+        admin_email = os.getenv("ADMIN_EMAIL")
+        if admin_email:
             existing = conn.execute(
                 "SELECT id FROM users WHERE role = 'admin'"
             ).fetchone()
@@ -110,48 +204,39 @@ def init_db():
 def get_user_by_email(email: str) -> Optional[dict]:
     """Get user by email"""
     with get_db() as conn:
-        row = conn.execute(
-            "SELECT * FROM users WHERE email = ?", (email,)
-        ).fetchone()
+        row = conn.execute(SQL_GET_USER_BY_EMAIL, (email,)).fetchone()
         return dict(row) if row else None
 
 
 def get_user_by_id(user_id: int) -> Optional[dict]:
     """Get user by ID"""
     with get_db() as conn:
-        row = conn.execute(
-            "SELECT * FROM users WHERE id = ?", (user_id,)
-        ).fetchone()
+        row = conn.execute(SQL_GET_USER_BY_ID, (user_id,)).fetchone()
         return dict(row) if row else None
 
 
 def create_or_update_user(email: str, name: str = None, picture: str = None) -> dict:
     """Create user if not exists, or update last_login"""
     with get_db() as conn:
-        existing = get_user_by_email(email)
-        if existing:
-            conn.execute(
-                "UPDATE users SET name = ?, picture = ?, last_login = ? WHERE email = ?",
-                (name or existing.get('name'), picture, datetime.now(), email)
-            )
-            conn.commit()
-            return get_user_by_email(email)
-        else:
-            conn.execute(
-                "INSERT INTO users (email, name, picture, last_login) VALUES (?, ?, ?, ?)",
-                (email, name, picture, datetime.now())
-            )
-            conn.commit()
-            return get_user_by_email(email)
+        row = conn.execute(
+            """INSERT INTO users (email, name, picture, last_login) VALUES (?, ?, ?, ?)
+               ON CONFLICT(email) DO UPDATE SET
+                   name = COALESCE(NULLIF(excluded.name, ''), users.name),
+                   picture = excluded.picture,
+                   last_login = excluded.last_login
+               RETURNING *""",
+            (email, name, picture, datetime.now())
+        ).fetchone()
+        conn.commit()
+        return dict(row)
 
 
-def get_all_users() -> List[dict]:
-    """Get all users"""
+def get_all_users() -> List[sqlite3.Row]:
+    """Get all users (rows support key access; use dict(row) for a copy)"""
     with get_db() as conn:
-        rows = conn.execute(
+        return conn.execute(
             "SELECT * FROM users ORDER BY created_at DESC"
         ).fetchall()
-        return [dict(row) for row in rows]
 
 
 def add_user(email: str, role: str = 'user') -> bool:
@@ -172,17 +257,18 @@ def delete_user(user_id: int) -> bool:
     """Delete a user"""
     with get_db() as conn:
         # Don't allow deleting the last admin
-        admins = conn.execute(
-            "SELECT COUNT(*) as count FROM users WHERE role = 'admin'"
+        deleted = conn.execute(
+            """DELETE FROM users WHERE id = ?
+               AND NOT (role = 'admin' AND (SELECT COUNT(*) FROM users WHERE role = 'admin') <= 1)
+               RETURNING id""",
+            (user_id,)
         ).fetchone()
-        user = get_user_by_id(user_id)
-        if user and user['role'] == 'admin' and admins['count'] <= 1:
-            return False
-        
-        conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
-        conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        if deleted:
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
         conn.commit()
-        return True
+    if deleted:
+        _invalidate_cached_sessions(user_id=user_id)
+    return deleted is not None
 
 
 def update_user_role(user_id: int, role: str) -> bool:
@@ -193,7 +279,8 @@ def update_user_role(user_id: int, role: str) -> bool:
             (role, user_id)
         )
         conn.commit()
-        return True
+    _invalidate_cached_sessions(user_id=user_id)
+    return True
 
 
 # ==================== 2FA MANAGEMENT ====================
@@ -209,7 +296,7 @@ def set_totp_secret(user_id: int, secret: str) -> bool:
         return True
 
 
-def enable_totp(user_id: int, backup_codes: str) -> bool:
+def enable_totp(user_id: int, backup_codes: bytes) -> bool:
     """Enable TOTP for a user"""
     with get_db() as conn:
         conn.execute(
@@ -217,7 +304,8 @@ def enable_totp(user_id: int, backup_codes: str) -> bool:
             (backup_codes, user_id)
         )
         conn.commit()
-        return True
+    _invalidate_cached_sessions(user_id=user_id)
+    return True
 
 
 def disable_totp(user_id: int) -> bool:
@@ -228,10 +316,11 @@ def disable_totp(user_id: int) -> bool:
             (user_id,)
         )
         conn.commit()
-        return True
+    _invalidate_cached_sessions(user_id=user_id)
+    return True
 
 
-def update_backup_codes(user_id: int, backup_codes: str) -> bool:
+def update_backup_codes(user_id: int, backup_codes: Optional[bytes]) -> bool:
     """Update backup codes after one is used"""
     with get_db() as conn:
         conn.execute(
@@ -268,22 +357,69 @@ def create_session(
             """INSERT INTO sessions 
                (session_id, user_id, expires_at, ip_address, user_agent, is_2fa_verified) 
                VALUES (?, ?, ?, ?, ?, ?)""",
-            (session_id, user_id, expires_at, ip_address, user_agent[:500] if user_agent else None, is_2fa_verified)
+            (session_id, user_id, expires_at, ip_address, truncate(user_agent or None), is_2fa_verified)
         )
         conn.commit()
 
 
+_session_cache: Dict[str, Tuple[float, dict]] = {}
+_session_cache_lock = threading.Lock()
+
+
+def _cache_session(session_id: str, session: dict, now: datetime) -> None:
+    """Cache a session until the TTL or its own expiry, whichever comes first"""
+    try:
+        remaining = (datetime.fromisoformat(str(session['expires_at'])) - now).total_seconds()
+    except ValueError:
+        return
+    ttl = min(SESSION_CACHE_TTL_SECONDS, remaining)
+    if ttl <= 0:
+        return
+    with _session_cache_lock:
+        if session_id not in _session_cache and len(_session_cache) >= SESSION_CACHE_MAX_SIZE:
+            # Evict the oldest entry
+            _session_cache.pop(next(iter(_session_cache)))
+        _session_cache[session_id] = (time.monotonic() + ttl, session)
+
+
+def _invalidate_cached_sessions(session_id: str = None, user_id: int = None) -> None:
+    """Drop cached sessions by id, by user, or all of them when no filter is given"""
+    with _session_cache_lock:
+        if session_id is not None:
+            _session_cache.pop(session_id, None)
+        elif user_id is not None:
+            for sid in [sid for sid, (_, s) in _session_cache.items() if s['user_id'] == user_id]:
+                del _session_cache[sid]
+        else:
+            _session_cache.clear()
+
+
+def get_cached_session(session_id: str) -> Optional[dict]:
+    """Get session from the in-process cache only, without touching the database"""
+    with _session_cache_lock:
+        entry = _session_cache.get(session_id)
+    if entry is None:
+        return None
+    if entry[0] > time.monotonic():
+        return dict(entry[1])
+    _invalidate_cached_sessions(session_id=session_id)
+    return None
+
+
 def get_session(session_id: str) -> Optional[dict]:
     """Get session by session_id"""
+    session = get_cached_session(session_id)
+    if session is not None:
+        return session
+    
+    now = _now()
     with get_db() as conn:
-        row = conn.execute(
-            """SELECT s.*, u.email, u.name, u.role, u.picture, u.totp_enabled
-               FROM sessions s 
-               JOIN users u ON s.user_id = u.id 
-               WHERE s.session_id = ? AND s.expires_at > ?""",
-            (session_id, datetime.now())
-        ).fetchone()
-        return dict(row) if row else None
+        row = conn.execute(SQL_GET_SESSION, (session_id, now)).fetchone()
+    if not row:
+        return None
+    session = dict(row)
+    _cache_session(session_id, session, now)
+    return dict(session)
 
 
 def update_session_2fa_verified(session_id: str) -> bool:
@@ -294,7 +430,8 @@ def update_session_2fa_verified(session_id: str) -> bool:
             (session_id,)
         )
         conn.commit()
-        return True
+    _invalidate_cached_sessions(session_id=session_id)
+    return True
 
 
 def delete_session(session_id: str) -> None:
@@ -302,6 +439,7 @@ def delete_session(session_id: str) -> None:
     with get_db() as conn:
         conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
         conn.commit()
+    _invalidate_cached_sessions(session_id=session_id)
 
 
 def delete_user_sessions(user_id: int) -> None:
@@ -309,12 +447,14 @@ def delete_user_sessions(user_id: int) -> None:
     with get_db() as conn:
         conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
         conn.commit()
+    _invalidate_cached_sessions(user_id=user_id)
 
 
 def cleanup_expired_sessions() -> int:
     """Remove expired sessions, returns count deleted"""
     with get_db() as conn:
-        cursor = conn.execute("DELETE FROM sessions WHERE expires_at < ?", (datetime.now(),))
+        # expires_at is written from Python local time, so compare in localtime
+        cursor = conn.execute("DELETE FROM sessions WHERE expires_at < datetime('now', 'localtime')")
         conn.commit()
         return cursor.rowcount
 
@@ -324,7 +464,8 @@ def invalidate_all_sessions() -> int:
     with get_db() as conn:
         cursor = conn.execute("DELETE FROM sessions")
         conn.commit()
-        return cursor.rowcount
+    _invalidate_cached_sessions()
+    return cursor.rowcount
 
 
 def get_user_sessions(user_id: int) -> List[dict]:
@@ -335,13 +476,168 @@ def get_user_sessions(user_id: int) -> List[dict]:
                FROM sessions 
                WHERE user_id = ? AND expires_at > ?
                ORDER BY created_at DESC""",
-            (user_id, datetime.now())
+            (user_id, _now())
         ).fetchall()
         return [dict(row) for row in rows]
 
 
 # ==================== AUDIT LOGGING ====================
 
+_AUDIT_COLUMNS = "timestamp, event_type, user_id, email, ip_address, user_agent, details, severity"
+
+_AUDIT_PARTITION_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        event_type TEXT NOT NULL,
+        user_id INTEGER,
+        email TEXT,
+        ip_address TEXT,
+        user_agent TEXT,
+        details TEXT,
+        severity TEXT DEFAULT 'info'
+    )
+"""
+
+_AUDIT_PARTITION_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table}(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_event_type ON {table}(event_type)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_ip_event_ts ON {table}(ip_address, event_type, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_user_ts ON {table}(user_id, timestamp)",
+)
+
+_AUDIT_INSERT = """INSERT INTO {table} 
+                   (event_type, user_id, email, ip_address, user_agent, details, severity)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+_audit_partitions: set = set()
+_audit_partitions_lock = threading.Lock()
+
+
+def _audit_partition_name(when: datetime) -> str:
+    """Partition table holding audit logs for the month of `when` (UTC)"""
+    return f"audit_logs_{when:%Y_%m}"
+
+
+def _list_audit_partitions(conn: sqlite3.Connection) -> List[str]:
+    """All audit partition tables, oldest first"""
+    rows = conn.execute(
+        """SELECT name FROM sqlite_master
+           WHERE type = 'table' AND name GLOB 'audit_logs_[0-9][0-9][0-9][0-9]_[0-9][0-9]'
+           ORDER BY name"""
+    ).fetchall()
+    return [row['name'] for row in rows]
+
+
+def _rebuild_audit_view(conn: sqlite3.Connection) -> None:
+    """Point the audit_logs view at the current set of partitions"""
+    partitions = _list_audit_partitions(conn)
+    conn.execute("DROP VIEW IF EXISTS audit_logs")
+    if partitions:
+        conn.execute(
+            "CREATE VIEW audit_logs AS "
+            + " UNION ALL ".join(f"SELECT * FROM {table}" for table in partitions)
+        )
+
+
+def _ensure_audit_partition(conn: sqlite3.Connection, table: str) -> None:
+    """Create a partition table (and refresh the view) the first time it is needed"""
+    if table in _audit_partitions:
+        return
+    with _audit_partitions_lock:
+        if table in _audit_partitions:
+            return
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if not exists:
+            conn.execute(_AUDIT_PARTITION_DDL.format(table=table))
+            for index in _AUDIT_PARTITION_INDEXES:
+                conn.execute(index.format(table=table))
+            _rebuild_audit_view(conn)
+            conn.commit()
+        _audit_partitions.add(table)
+
+
+def _migrate_unpartitioned_audit_logs(conn: sqlite3.Connection) -> None:
+    """Move rows from the old single audit_logs table into monthly partitions"""
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'audit_logs'"
+    ).fetchone()
+    if not legacy:
+        return
+    
+    conn.execute("ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned")
+    months = conn.execute(
+        "SELECT DISTINCT strftime('%Y_%m', COALESCE(timestamp, 'now')) AS month FROM audit_logs_unpartitioned"
+    ).fetchall()
+    for row in months:
+        table = f"audit_logs_{row['month']}"
+        conn.execute(_AUDIT_PARTITION_DDL.format(table=table))
+        for index in _AUDIT_PARTITION_INDEXES:
+            conn.execute(index.format(table=table))
+        conn.execute(
+            f"""INSERT INTO {table} ({_AUDIT_COLUMNS})
+                SELECT {_AUDIT_COLUMNS} FROM audit_logs_unpartitioned
+                WHERE strftime('%Y_%m', COALESCE(timestamp, 'now')) = ?
+                ORDER BY id""",
+            (row['month'],)
+        )
+    conn.execute("DROP TABLE audit_logs_unpartitioned")
+    _rebuild_audit_view(conn)
+
+
+_audit_queue: queue.Queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_audit_writer_thread: Optional[threading.Thread] = None
+_audit_writer_lock = threading.Lock()
+
+
+def _write_audit_rows(rows: List[tuple]) -> None:
+    """Insert a batch of audit rows in a single transaction"""
+    try:
+        with get_db() as conn:
+            # CURRENT_TIMESTAMP is UTC, so partition by the UTC month
+            table = _audit_partition_name(datetime.utcnow())
+            _ensure_audit_partition(conn, table)
+            conn.executemany(_AUDIT_INSERT.format(table=table), rows)
+            conn.commit()
+    except Exception:
+        # The batch is lost; make sure that shows up as an error, with the cause
+        logger.exception("Failed to write %d audit log(s), batch dropped", len(rows))
+
+
+def _audit_writer() -> None:
+    """Background thread: drain the audit queue and commit in batches"""
+    while True:
+        rows = [_audit_queue.get()]
+        deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL_SECONDS
+        while len(rows) < AUDIT_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                rows.append(_audit_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        
+        _write_audit_rows(rows)
+        for _ in rows:
+            _audit_queue.task_done()
+
+
+def _ensure_audit_writer() -> None:
+    """Start the audit writer thread on first use"""
+    global _audit_writer_thread
+    if _audit_writer_thread is not None:
+        return
+    with _audit_writer_lock:
+        if _audit_writer_thread is None:
+            _audit_writer_thread = threading.Thread(
+                target=_audit_writer, name="audit-writer", daemon=True
+            )
+            _audit_writer_thread.start()
+
+
 def create_audit_log(
     event_type: str,
     user_id: int = None,
@@ -351,15 +647,39 @@ def create_audit_log(
     details: str = None,
     severity: str = 'info'
 ) -> None:
-    """Create an audit log entry"""
-    with get_db() as conn:
-        conn.execute(
-            """INSERT INTO audit_logs 
-               (event_type, user_id, email, ip_address, user_agent, details, severity)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (event_type, user_id, email, ip_address, user_agent, details, severity)
-        )
-        conn.commit()
+    """Queue an audit log entry for the background writer"""
+    row = (event_type, user_id, email, ip_address, user_agent, details, severity)
+    _ensure_audit_writer()
+    try:
+        _audit_queue.put_nowait(row)
+    except queue.Full:
+        # Writer is falling behind: write synchronously rather than drop the event
+        _write_audit_rows([row])
+
+
+def flush_audit_logs() -> None:
+    """Block until all queued audit logs have been written"""
+    if _audit_writer_thread is not None:
+        _audit_queue.join()
+
+
+def _build_audit_query(by_event_type: bool, by_user_id: bool, by_severity: bool) -> str:
+    """Build the get_audit_logs query for one combination of filters"""
+    query = "SELECT * FROM audit_logs WHERE 1=1"
+    if by_event_type:
+        query += " AND event_type = ?"
+    if by_user_id:
+        query += " AND user_id = ?"
+    if by_severity:
+        query += " AND severity = ?"
+    return query + " ORDER BY timestamp DESC LIMIT ?"
+
+
+# All filter combinations, built once so each variant keeps a stable statement
+_AUDIT_QUERIES = {
+    flags: _build_audit_query(*flags)
+    for flags in itertools.product((False, True), repeat=3)
+}
 
 
 def get_audit_logs(
@@ -367,45 +687,57 @@ def get_audit_logs(
     event_type: str = None,
     user_id: int = None,
     severity: str = None
-) -> List[dict]:
-    """Get audit logs with optional filters"""
-    query = "SELECT * FROM audit_logs WHERE 1=1"
-    params = []
-    
-    if event_type:
-        query += " AND event_type = ?"
-        params.append(event_type)
-    if user_id:
-        query += " AND user_id = ?"
-        params.append(user_id)
-    if severity:
-        query += " AND severity = ?"
-        params.append(severity)
-    
-    query += " ORDER BY timestamp DESC LIMIT ?"
+) -> List[sqlite3.Row]:
+    """Get audit logs with optional filters (rows support key access)"""
+    flags = (bool(event_type), bool(user_id), bool(severity))
+    params = [value for value, flag in zip((event_type, user_id, severity), flags) if flag]
     params.append(limit)
     
     with get_db() as conn:
-        rows = conn.execute(query, params).fetchall()
-        return [dict(row) for row in rows]
+        return conn.execute(_AUDIT_QUERIES[flags], params).fetchall()
 
 
 def count_events_by_ip(ip_address: str, event_type: str, minutes: int = 60) -> int:
     """Count events from an IP in the last N minutes"""
-    since = datetime.now() - timedelta(minutes=minutes)
+    # timestamp defaults to CURRENT_TIMESTAMP (UTC), so let SQLite do the math
     with get_db() as conn:
         row = conn.execute(
             """SELECT COUNT(*) as count FROM audit_logs 
-               WHERE ip_address = ? AND event_type = ? AND timestamp > ?""",
-            (ip_address, event_type, since)
+               WHERE ip_address = ? AND event_type = ? AND timestamp > datetime('now', ?)""",
+            (ip_address, event_type, f"-{int(minutes)} minutes")
         ).fetchone()
         return row['count'] if row else 0
 
 
-def cleanup_old_audit_logs(days: int = 90) -> int:
-    """Remove audit logs older than N days"""
-    cutoff = datetime.now() - timedelta(days=days)
+def cleanup_old_audit_logs(days: int = AUDIT_RETENTION_DAYS) -> int:
+    """
+    Drop audit partitions whose whole month is older than N days.
+    Returns the number of partitions dropped.
+    """
     with get_db() as conn:
-        cursor = conn.execute("DELETE FROM audit_logs WHERE timestamp < ?", (cutoff,))
-        conn.commit()
-        return cursor.rowcount
+        cutoff = conn.execute("SELECT strftime('%Y_%m', 'now', ?)", (f"-{int(days)} days",)).fetchone()[0]
+        expired = [t for t in _list_audit_partitions(conn) if t < f"audit_logs_{cutoff}"]
+        if not expired:
+            return 0
+        
+        with _audit_partitions_lock:
+            for table in expired:
+                conn.execute(f"DROP TABLE {table}")
+                _audit_partitions.discard(table)
+            _rebuild_audit_view(conn)
+            conn.commit()
+        logger.info("🧹 Dropped %d expired audit log partition(s)", len(expired))
+        return len(expired)
+
+
+def checkpoint_wal() -> None:
+    """Fold the WAL back into the database file and truncate it"""
+    with get_db() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def run_maintenance() -> None:
+    """Periodic housekeeping: expire sessions, drop old audit partitions, trim the WAL"""
+    cleanup_expired_sessions()
+    cleanup_old_audit_logs()
+    checkpoint_wal()
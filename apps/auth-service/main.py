@@ -12,21 +12,24 @@ Security features:
 - Audit logging
 """
 import os
-import secrets
+import asyncio
+import logging
+import base64
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional
 
+import orjson
 from fastapi import FastAPI, Request, Response, HTTPException, Form, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from starlette.middleware.sessions import SessionMiddleware
 from authlib.integrations.starlette_client import OAuth
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
 import database
 from security import (
-    limiter, validate_redirect_url, add_security_headers,
+    limiter, validate_redirect_url, SecurityHeadersMiddleware, ScopedSessionMiddleware,
     validate_email, sanitize_string, validate_role,
     is_suspicious_request, get_real_ip, rate_limit_exceeded_handler,
     RATE_LIMITS
@@ -40,29 +43,93 @@ GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "")
 SECRET_KEY = os.getenv("SECRET_KEY", "")
 SESSION_DURATION_HOURS = int(os.getenv("SESSION_DURATION_HOURS", "24"))
+SESSION_DURATION = timedelta(hours=SESSION_DURATION_HOURS)
+SESSION_DURATION_SECS = SESSION_DURATION_HOURS * 3600
 BASE_URL = os.getenv("BASE_URL", "https://keonycs.com")
 COOKIE_NAME = "auth_session"
+DEFAULT_NEXT_URL = "/tools/"
 COOKIE_DOMAIN = os.getenv("COOKIE_DOMAIN", "keonycs.com")
+MAINTENANCE_INTERVAL_HOURS = int(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+
+# Health check body never changes, so serialize it once
+HEALTH_BODY = orjson.dumps({"status": "healthy", "service": "auth-service", "security": "enterprise"})
+
+# Cookie attributes are fixed at import time, so render them once
+_COOKIE_DOMAIN_ATTR = f"; Domain={COOKIE_DOMAIN}" if COOKIE_DOMAIN != "localhost" else ""
+_SESSION_COOKIE_SUFFIX = f"{_COOKIE_DOMAIN_ATTR}; HttpOnly; Max-Age={SESSION_DURATION_SECS}; Path=/; SameSite=lax; Secure"
+_DELETE_COOKIE_HEADER = (
+    b"set-cookie",
+    f'{COOKIE_NAME}=""{_COOKIE_DOMAIN_ATTR}; Max-Age=0; Path=/; SameSite=lax'.encode("latin-1"),
+)
+
+# Console logging for audit and alert messages
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)s | %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%S"
+)
+logger = logging.getLogger("auth")
 
 # Validate required configuration
 if not SECRET_KEY or SECRET_KEY == "supersecretkey123":
     raise ValueError("SECRET_KEY must be set to a secure random value!")
 
+# ==================== LIFESPAN ====================
+
+async def maintenance_loop():
+    """Run database housekeeping periodically (expired sessions, audit retention, WAL checkpoint)"""
+    while True:
+        await asyncio.sleep(MAINTENANCE_INTERVAL_HOURS * 3600)
+        try:
+            await asyncio.to_thread(database.run_maintenance)
+        except Exception:
+            logger.exception("Database maintenance failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize database on startup, flush pending alerts and audit logs on shutdown"""
+    database.init_db()
+    await audit.start()
+    # Run the startup cleanups off the event loop so readiness isn't blocked
+    cleaned, _ = await asyncio.gather(
+        asyncio.to_thread(database.cleanup_expired_sessions),
+        asyncio.to_thread(database.cleanup_old_audit_logs),
+    )
+    if cleaned:
+        print(f"🧹 Cleaned {cleaned} expired sessions")
+    maintenance_task = asyncio.create_task(maintenance_loop())
+    # Nearly every login page hit uses the default redirect, so render it once
+    app.state.login_page_html = templates.get_template("login.html").render(
+        request=Request({"type": "http", "query_string": b"", "headers": []}),
+        next=DEFAULT_NEXT_URL
+    )
+    print("✅ Auth Service initialized with enterprise security")
+    if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
+        print("⚠️  WARNING: Google OAuth credentials not configured!")
+    
+    yield
+    
+    maintenance_task.cancel()
+    await audit.shutdown()
+    await asyncio.to_thread(database.flush_audit_logs)
+
+
 # ==================== INITIALIZE APP ====================
 
-app = FastAPI(title="Auth Service", docs_url=None, redoc_url=None, openapi_url=None)
+app = FastAPI(title="Auth Service", docs_url=None, redoc_url=None, openapi_url=None, lifespan=lifespan)
 
 # Add rate limiter
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
-# Add session middleware
-app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY, max_age=3600)
+# Add session middleware, only on the OAuth and 2FA routes that use request.session
+# so /auth/verify and the rest skip signing the cookie on every response
+SESSION_PATHS = ("/auth/google", "/auth/callback", "/auth/2fa/verify")
+app.add_middleware(ScopedSessionMiddleware, paths=SESSION_PATHS, secret_key=SECRET_KEY, max_age=3600)
 
 # Add security headers middleware
-@app.middleware("http")
-async def security_headers_middleware(request: Request, call_next):
-    return await add_security_headers(request, call_next)
+app.add_middleware(SecurityHeadersMiddleware)
 
 # Templates
 templates = Jinja2Templates(directory="templates")
@@ -80,28 +147,54 @@ oauth.register(
 # Audit logger
 audit = AuditLogger(database)
 
-# ==================== STARTUP ====================
+# ==================== AUTH HELPERS ====================
 
-@app.on_event("startup")
-async def startup():
-    """Initialize database on startup"""
-    database.init_db()
-    cleaned = database.cleanup_expired_sessions()
-    if cleaned:
-        print(f"🧹 Cleaned {cleaned} expired sessions")
-    print("✅ Auth Service initialized with enterprise security")
-    if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
-        print("⚠️  WARNING: Google OAuth credentials not configured!")
+_MISSING = object()
+_COOKIE_KEY = COOKIE_NAME.encode("latin-1") + b"="
 
 
-# ==================== AUTH HELPERS ====================
+def get_session_cookie(request: Request) -> Optional[str]:
+    """Extract the session cookie without parsing the whole Cookie header"""
+    for name, value in request.scope["headers"]:
+        if name == b"cookie":
+            break
+    else:
+        return None
+    
+    # Match the name only at the start of a cookie pair, not inside another name
+    start = 0
+    while True:
+        i = value.find(_COOKIE_KEY, start)
+        if i < 0:
+            return None
+        if i == 0 or value[i - 1] in b"; ":
+            break
+        start = i + 1
+    
+    i += len(_COOKIE_KEY)
+    j = value.find(b";", i)
+    session_id = (value[i:] if j < 0 else value[i:j]).strip()
+    return session_id.decode("latin-1") or None
+
+
+async def get_request_session(request: Request) -> Optional[dict]:
+    """Get the session for the request cookie, looked up at most once per request"""
+    session = getattr(request.state, "auth_session", _MISSING)
+    if session is _MISSING:
+        session_id = get_session_cookie(request)
+        session = None
+        if session_id:
+            # Only pay for a thread hop when the session isn't cached in-process
+            session = database.get_cached_session(session_id)
+            if session is None:
+                session = await asyncio.to_thread(database.get_session, session_id)
+        request.state.auth_session = session
+    return session
 
-def get_current_user(request: Request) -> Optional[dict]:
+
+async def get_current_user(request: Request) -> Optional[dict]:
     """Get current user from session cookie"""
-    session_id = request.cookies.get(COOKIE_NAME)
-    if not session_id:
-        return None
-    session = database.get_session(session_id)
+    session = await get_request_session(request)
     if not session:
         return None
     
@@ -112,12 +205,9 @@ def get_current_user(request: Request) -> Optional[dict]:
     return session
 
 
-def get_pending_2fa_user(request: Request) -> Optional[dict]:
+async def get_pending_2fa_user(request: Request) -> Optional[dict]:
     """Get user who has authenticated but not completed 2FA"""
-    session_id = request.cookies.get(COOKIE_NAME)
-    if not session_id:
-        return None
-    session = database.get_session(session_id)
+    session = await get_request_session(request)
     if not session:
         return None
     
@@ -128,17 +218,20 @@ def get_pending_2fa_user(request: Request) -> Optional[dict]:
     return None
 
 
-def require_auth(request: Request) -> dict:
+async def require_auth(request: Request) -> dict:
     """Dependency that requires authentication"""
-    user = get_current_user(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+    user = getattr(request.state, "user", None)
+    if user is None:
+        user = await get_current_user(request)
+        if not user:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        request.state.user = user
     return user
 
 
-def require_admin(request: Request) -> dict:
+async def require_admin(request: Request) -> dict:
     """Dependency that requires admin role"""
-    user = require_auth(request)
+    user = await require_auth(request)
     if user.get('role') != 'admin':
         audit.log(
             EventType.UNAUTHORIZED_ACCESS,
@@ -166,18 +259,22 @@ async def login_page(request: Request, next: str = "/tools/"):
             details={"endpoint": "/auth/login"}
         )
     
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if user:
         return RedirectResponse(url=validate_redirect_url(next), status_code=302)
     
     # Check if 2FA is pending
-    pending_user = get_pending_2fa_user(request)
+    pending_user = await get_pending_2fa_user(request)
     if pending_user:
         return RedirectResponse(url="/auth/2fa", status_code=302)
     
+    next_safe = validate_redirect_url(next)
+    if next_safe == DEFAULT_NEXT_URL and "error" not in request.query_params:
+        return HTMLResponse(app.state.login_page_html)
+    
     return templates.TemplateResponse("login.html", {
         "request": request,
-        "next": validate_redirect_url(next)
+        "next": next_safe
     })
 
 
@@ -224,7 +321,7 @@ async def google_callback(request: Request):
     picture = user_info.get('picture')
     
     # Check if user is authorized
-    db_user = database.get_user_by_email(email)
+    db_user = await asyncio.to_thread(database.get_user_by_email, email)
     if not db_user:
         audit.log(
             EventType.LOGIN_FAILED,
@@ -239,14 +336,16 @@ async def google_callback(request: Request):
         }, status_code=403)
     
     # Update user info and create session
-    db_user = database.create_or_update_user(email, name, picture)
-    session_id = secrets.token_urlsafe(32)
-    expires_at = datetime.now() + timedelta(hours=SESSION_DURATION_HOURS)
+    db_user = await asyncio.to_thread(database.create_or_update_user, email, name, picture)
+    # 24 random bytes encode to 32 url-safe chars with no padding to strip
+    session_id = base64.urlsafe_b64encode(os.urandom(24)).decode("ascii")
+    expires_at = datetime.now() + SESSION_DURATION
     
     # Check if 2FA is enabled
     is_2fa_verified = not db_user.get('totp_enabled', False)
     
-    database.create_session(
+    await asyncio.to_thread(
+        database.create_session,
         user_id=db_user['id'],
         session_id=session_id,
         expires_at=expires_at,
@@ -271,14 +370,8 @@ async def google_callback(request: Request):
         next_url = request.session.pop('next_url', '/tools/')
     
     response = RedirectResponse(url=next_url, status_code=302)
-    response.set_cookie(
-        key=COOKIE_NAME,
-        value=session_id,
-        httponly=True,
-        secure=True,
-        samesite='lax',
-        max_age=SESSION_DURATION_HOURS * 3600,
-        domain=COOKIE_DOMAIN if COOKIE_DOMAIN != "localhost" else None
+    response.raw_headers.append(
+        (b"set-cookie", f"{COOKIE_NAME}={session_id}{_SESSION_COOKIE_SUFFIX}".encode("latin-1"))
     )
     return response
 
@@ -286,8 +379,8 @@ async def google_callback(request: Request):
 @app.get("/auth/logout")
 async def logout(request: Request):
     """Logout and clear session"""
-    session_id = request.cookies.get(COOKIE_NAME)
-    user = get_current_user(request) or get_pending_2fa_user(request)
+    session_id = get_session_cookie(request)
+    user = await get_current_user(request) or await get_pending_2fa_user(request)
     
     if session_id:
         database.delete_session(session_id)
@@ -300,23 +393,22 @@ async def logout(request: Request):
             )
     
     response = RedirectResponse(url="/auth/login", status_code=302)
-    response.delete_cookie(key=COOKIE_NAME, domain=COOKIE_DOMAIN if COOKIE_DOMAIN != "localhost" else None)
+    response.raw_headers.append(_DELETE_COOKIE_HEADER)
     return response
 
 
 @app.get("/auth/verify")
 async def verify_session(request: Request, next: str = "/tools/"):
     """Verify session for Caddy forward_auth"""
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if user:
-        return Response(
-            status_code=200,
-            headers={
-                "X-Auth-User": user.get('email', ''),
-                "X-Auth-Name": user.get('name', ''),
-                "X-Auth-Role": user.get('role', 'user')
-            }
-        )
+        response = Response(status_code=200)
+        response.raw_headers.extend((
+            (b"x-auth-user", (user.get('email') or '').encode("latin-1")),
+            (b"x-auth-name", (user.get('name') or '').encode("latin-1")),
+            (b"x-auth-role", (user.get('role') or 'user').encode("latin-1")),
+        ))
+        return response
     
     # Not authenticated - redirect to login
     # Caddy forward_auth will follow this redirect
@@ -326,11 +418,26 @@ async def verify_session(request: Request, next: str = "/tools/"):
 
 # ==================== 2FA ENDPOINTS ====================
 
+# Last TOTP time step accepted per user. A code from that step or an earlier one is
+# rejected, so a captured code can't be replayed while it is still inside valid_window
+_last_totp_step: Dict[int, int] = {}
+
+
+def check_totp_code(user_id: int, secret: str, code: str) -> bool:
+    """Verify a TOTP code, rejecting codes from a step this user already used"""
+    step = totp_utils.match_totp_step(secret, code)
+    if step is None or step <= _last_totp_step.get(user_id, -1):
+        return False
+    
+    _last_totp_step[user_id] = step
+    return True
+
+
 @app.get("/auth/2fa", response_class=HTMLResponse)
 @limiter.limit(RATE_LIMITS["login"])
 async def totp_page(request: Request):
     """2FA verification page"""
-    user = get_pending_2fa_user(request)
+    user = await get_pending_2fa_user(request)
     if not user:
         return RedirectResponse(url="/auth/login", status_code=302)
     
@@ -345,16 +452,16 @@ async def totp_page(request: Request):
 async def verify_totp(request: Request, code: str = Form(...)):
     """Verify TOTP code"""
     ip_address = get_real_ip(request)
-    user = get_pending_2fa_user(request)
+    user = await get_pending_2fa_user(request)
     
     if not user:
         return RedirectResponse(url="/auth/login", status_code=302)
     
-    session_id = request.cookies.get(COOKIE_NAME)
+    session_id = get_session_cookie(request)
     totp_info = database.get_totp_info(user['user_id'])
     
     # Try TOTP code first
-    if totp_utils.verify_totp(totp_info['totp_secret'], code):
+    if check_totp_code(user['user_id'], totp_info['totp_secret'], code):
         database.update_session_2fa_verified(session_id)
         audit.log(
             EventType.TOTP_VERIFIED,
@@ -410,7 +517,7 @@ async def setup_2fa_page(request: Request, user: dict = Depends(require_auth)):
         secret = totp_utils.generate_totp_secret()
         database.set_totp_secret(user['user_id'], secret)
     
-    qr_code = totp_utils.generate_qr_code(secret, user['email'])
+    qr_code = await asyncio.to_thread(totp_utils.generate_qr_code, secret, user['email'])
     manual_key = totp_utils.format_secret_for_manual_entry(secret)
     
     return templates.TemplateResponse("2fa_setup.html", {
@@ -450,7 +557,7 @@ async def enable_2fa(request: Request, code: str = Form(...), user: dict = Depen
     
     # Invalid code - show setup again
     secret = totp_info['totp_secret']
-    qr_code = totp_utils.generate_qr_code(secret, user['email'])
+    qr_code = await asyncio.to_thread(totp_utils.generate_qr_code, secret, user['email'])
     manual_key = totp_utils.format_secret_for_manual_entry(secret)
     
     return templates.TemplateResponse("2fa_setup.html", {
@@ -507,7 +614,7 @@ async def disable_2fa(request: Request, code: str = Form(...), user: dict = Depe
 @limiter.limit(RATE_LIMITS["admin"])
 async def admin_panel(request: Request, user: dict = Depends(require_admin)):
     """Admin panel to manage users"""
-    users = database.get_all_users()
+    users = await asyncio.to_thread(database.get_all_users)
     return templates.TemplateResponse("admin.html", {
         "request": request,
         "user": user,
@@ -532,7 +639,7 @@ async def add_user(
     if not validate_email(email):
         return RedirectResponse(url="/auth/admin?error=invalid_email", status_code=302)
     
-    success = database.add_user(email, role)
+    success = await asyncio.to_thread(database.add_user, email, role)
     if success:
         audit.log(
             EventType.USER_ADDED,
@@ -556,8 +663,8 @@ async def delete_user(
     if user_id == user.get('user_id'):
         return RedirectResponse(url="/auth/admin?error=cannot_delete_self", status_code=302)
     
-    target_user = database.get_user_by_id(user_id)
-    success = database.delete_user(user_id)
+    target_user = await asyncio.to_thread(database.get_user_by_id, user_id)
+    success = await asyncio.to_thread(database.delete_user, user_id)
     
     if success:
         audit.log(
@@ -581,14 +688,14 @@ async def update_role(
 ):
     """Update user role"""
     role = validate_role(role)
-    target_user = database.get_user_by_id(user_id)
+    target_user = await asyncio.to_thread(database.get_user_by_id, user_id)
     old_role = target_user.get('role') if target_user else None
     
-    database.update_user_role(user_id, role)
+    await asyncio.to_thread(database.update_user_role, user_id, role)
     
     # Invalidate user sessions if role changed
     if old_role != role:
-        database.delete_user_sessions(user_id)
+        await asyncio.to_thread(database.delete_user_sessions, user_id)
         audit.log(
             EventType.ROLE_CHANGED,
             user_id=user.get('user_id'),
@@ -608,7 +715,7 @@ async def update_role(
 @limiter.limit(RATE_LIMITS["admin"])
 async def audit_logs_page(request: Request, user: dict = Depends(require_admin)):
     """View audit logs"""
-    logs = database.get_audit_logs(limit=200)
+    logs = await asyncio.to_thread(database.get_audit_logs, limit=200)
     return templates.TemplateResponse("audit.html", {
         "request": request,
         "user": user,
@@ -621,7 +728,7 @@ async def audit_logs_page(request: Request, user: dict = Depends(require_admin))
 @app.get("/auth/health")
 async def health():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "auth-service", "security": "enterprise"}
+    return Response(content=HEALTH_BODY, media_type="application/json")
 
 
 if __name__ == "__main__":
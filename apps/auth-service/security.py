@@ -4,14 +4,14 @@ Rate limiting, CSRF, headers, and validation
 """
 import os
 import re
-from urllib.parse import urlparse
 from typing import Optional
-from functools import wraps
+from functools import lru_cache, wraps
 
 from fastapi import Request, Response, HTTPException
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from starlette.middleware.sessions import SessionMiddleware
 
 # ==================== CONFIGURATION ====================
 
@@ -35,7 +35,16 @@ RATE_LIMITS = {
 # ==================== RATE LIMITER ====================
 
 def get_real_ip(request: Request) -> str:
-    """Get real client IP, considering proxies"""
+    """Get real client IP, considering proxies. Parsed once per request."""
+    ip = getattr(request.state, "real_ip", None)
+    if ip is None:
+        ip = _parse_real_ip(request)
+        request.state.real_ip = ip
+    return ip
+
+
+def _parse_real_ip(request: Request) -> str:
+    """Extract the client IP from the proxy headers"""
     # Check X-Forwarded-For header (set by Caddy)
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
@@ -50,10 +59,20 @@ def get_real_ip(request: Request) -> str:
     # Fallback to direct client IP
     return get_remote_address(request)
 
-limiter = Limiter(key_func=get_real_ip)
+# Shared storage (e.g. redis://redis:6379/1) keeps limits consistent across workers;
+# the moving window avoids the fixed window's double burst at boundaries
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+
+limiter = Limiter(
+    key_func=get_real_ip,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy="moving-window",
+    in_memory_fallback_enabled=True
+)
 
 # ==================== REDIRECT VALIDATION ====================
 
+@lru_cache(maxsize=128)
 def validate_redirect_url(url: str, default: str = "/tools/") -> str:
     """
     Validate and sanitize redirect URL to prevent open redirect attacks.
@@ -77,16 +96,14 @@ def validate_redirect_url(url: str, default: str = "/tools/") -> str:
             return default
         return url
     
-    # Check absolute URLs
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in ("http", "https"):
-            return default
-        if parsed.netloc and parsed.netloc.lower() not in ALLOWED_REDIRECT_HOSTS:
-            return default
-        return url
-    except Exception:
+    # Check absolute URLs, only scheme and host matter so skip urlparse
+    scheme, sep, rest = url.partition("://")
+    if not sep or scheme not in ("http", "https"):
+        return default
+    netloc = rest.partition("/")[0].partition("?")[0].partition("#")[0]
+    if netloc.lower() not in ALLOWED_REDIRECT_HOSTS:
         return default
+    return url
 
 # ==================== SECURITY HEADERS ====================
 
@@ -100,31 +117,77 @@ SECURITY_HEADERS = {
     "Pragma": "no-cache"
 }
 
-async def add_security_headers(request: Request, call_next):
-    """Middleware to add security headers to all responses"""
-    response = await call_next(request)
+# Pre-encoded ASGI header pairs, built once at import
+_SECURITY_HEADER_ITEMS = [
+    (name.lower().encode("latin-1"), value.encode("latin-1"))
+    for name, value in SECURITY_HEADERS.items()
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in _SECURITY_HEADER_ITEMS)
+
+
+class SecurityHeadersMiddleware:
+    """Pure ASGI middleware to add security headers to all responses"""
+    
+    def __init__(self, app):
+        self.app = app
     
-    for header, value in SECURITY_HEADERS.items():
-        response.headers[header] = value
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                # Security headers override any value set by the endpoint
+                headers = [
+                    (name, value) for name, value in message.get("headers", ())
+                    if name.lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(_SECURITY_HEADER_ITEMS)
+                message["headers"] = headers
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
+
+
+class ScopedSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware that only loads and re-signs the cookie on the given paths"""
     
-    return response
+    def __init__(self, app, paths, **kwargs):
+        super().__init__(app, **kwargs)
+        self.paths = frozenset(paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
 # ==================== INPUT VALIDATION ====================
 
-EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Local part and domain are matched separately with bounded, unambiguous
+# patterns so pathological input can't trigger catastrophic backtracking
+EMAIL_LOCAL_REGEX = re.compile(r'[a-zA-Z0-9._%+-]{1,64}')
+EMAIL_DOMAIN_REGEX = re.compile(r'(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,63}')
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
     if not email or len(email) > 254:
         return False
-    return bool(EMAIL_REGEX.match(email))
+    local, sep, domain = email.rpartition("@")
+    if not sep:
+        return False
+    return bool(EMAIL_LOCAL_REGEX.fullmatch(local) and EMAIL_DOMAIN_REGEX.fullmatch(domain))
+
+# Null bytes and C0/C1 control characters, deleted via str.translate
+CONTROL_CHARS_TABLE = dict.fromkeys([*range(0x00, 0x20), *range(0x7f, 0xa0)])
 
 def sanitize_string(value: str, max_length: int = 255) -> str:
     """Sanitize string input"""
     if not value:
         return ""
     # Remove null bytes and control characters
-    value = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', value)
+    value = value.translate(CONTROL_CHARS_TABLE)
     # Truncate to max length
     return value[:max_length].strip()
 
@@ -139,27 +202,26 @@ def validate_role(role: str) -> str:
 
 # ==================== SUSPICIOUS ACTIVITY DETECTION ====================
 
+# Known scanner/bot patterns, matched in one case-insensitive pass
+SUSPICIOUS_UA_PATTERNS = (
+    "sqlmap", "nikto", "nmap", "masscan",
+    "burp", "owasp", "dirbuster", "gobuster",
+    "hydra", "medusa", "nessus", "acunetix"
+)
+SUSPICIOUS_UA_REGEX = re.compile("|".join(map(re.escape, SUSPICIOUS_UA_PATTERNS)), re.IGNORECASE)
+
 def is_suspicious_request(request: Request) -> bool:
     """Detect potentially suspicious requests"""
-    user_agent = request.headers.get("User-Agent", "")
-    
+    return _is_suspicious_user_agent(request.headers.get("User-Agent", ""))
+
+
+@lru_cache(maxsize=1024)
+def _is_suspicious_user_agent(user_agent: str) -> bool:
+    """Check a User-Agent against known scanners, memoized since bots repeat theirs"""
     # No user agent
     if not user_agent:
         return True
-    
-    # Known scanner/bot patterns
-    suspicious_patterns = [
-        "sqlmap", "nikto", "nmap", "masscan",
-        "burp", "owasp", "dirbuster", "gobuster",
-        "hydra", "medusa", "nessus", "acunetix"
-    ]
-    
-    ua_lower = user_agent.lower()
-    for pattern in suspicious_patterns:
-        if pattern in ua_lower:
-            return True
-    
-    return False
+    return SUSPICIOUS_UA_REGEX.search(user_agent) is not None
 
 # ==================== RATE LIMIT EXCEEDED HANDLER ====================
 
@@ -3,19 +3,30 @@ Two-Factor Authentication (2FA/TOTP) for Auth Service
 Uses pyotp for TOTP generation and verification
 """
 import os
+import hmac
+import hashlib
 import secrets
 import base64
+import time
 from io import BytesIO
-from typing import Optional, List, Tuple
+from functools import lru_cache
+from typing import Optional, List, Tuple, Union
 
 import pyotp
-import qrcode
-from qrcode.image.pil import PilImage
+import segno
 
 # Configuration
 TOTP_ISSUER = os.getenv("TOTP_ISSUER", "Dashboard-MAITSA")
 BACKUP_CODES_COUNT = 10
 BACKUP_CODE_LENGTH = 8
+BACKUP_CODE_DIGEST_SIZE = 16
+# Backup codes are stored as keyed hashes, so a database leak alone doesn't reveal them.
+# Changing this key invalidates every stored backup code. It falls back to SECRET_KEY when
+# unset, which ties the codes to session key rotation. Hashed to 32 bytes because BLAKE2b
+# keys are capped at 64 bytes and `openssl rand -hex 64` secrets are 128 characters
+BACKUP_CODE_KEY = hashlib.sha256(
+    (os.getenv("BACKUP_CODE_KEY") or os.getenv("SECRET_KEY", "")).encode()
+).digest()
 
 # ==================== TOTP FUNCTIONS ====================
 
@@ -24,36 +35,33 @@ def generate_totp_secret() -> str:
     return pyotp.random_base32()
 
 
+@lru_cache(maxsize=4096)
+def _totp(secret: str) -> pyotp.TOTP:
+    """TOTP instance for a secret, reused across retries (verification doesn't mutate it)"""
+    return pyotp.TOTP(secret)
+
+
 def get_totp_uri(secret: str, email: str) -> str:
     """Generate the TOTP provisioning URI for QR code"""
-    totp = pyotp.TOTP(secret)
+    totp = _totp(secret)
     return totp.provisioning_uri(name=email, issuer_name=TOTP_ISSUER)
 
 
+@lru_cache(maxsize=64)
 def generate_qr_code(secret: str, email: str) -> str:
     """
     Generate QR code for TOTP setup.
-    Returns base64-encoded PNG image.
+    Returns base64-encoded SVG image, cached per (secret, email) since
+    the setup page is re-rendered with the same secret after a bad code.
     """
     uri = get_totp_uri(secret, email)
     
     # Generate QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(uri)
-    qr.make(fit=True)
-    
-    # Create image
-    img = qr.make_image(fill_color="black", back_color="white")
+    qr = segno.make(uri, error="l")
     
-    # Convert to base64
+    # Write SVG straight from the module matrix, no raster or zlib encode
     buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    buffer.seek(0)
+    qr.save(buffer, kind="svg", border=4, xmldecl=False, omitsize=True, dark="black", light="white")
     
     return base64.b64encode(buffer.getvalue()).decode('utf-8')
 
@@ -63,46 +71,66 @@ def verify_totp(secret: str, code: str) -> bool:
     Verify a TOTP code.
     Allows 1 period tolerance for clock drift.
     """
+    return match_totp_step(secret, code) is not None
+
+
+def match_totp_step(secret: str, code: str) -> Optional[int]:
+    """
+    Verify a TOTP code and return the time step (counter) it belongs to.
+    Same 1 period tolerance as verify_totp; None if the code doesn't match.
+    """
     if not secret or not code:
-        return False
+        return None
     
     # Remove spaces and normalize
     code = code.replace(" ", "").replace("-", "")
     
-    # Must be 6 digits
-    if not code.isdigit() or len(code) != 6:
-        return False
+    # Must be 6 ASCII digits (isdigit alone also accepts e.g. Arabic-Indic digits)
+    if not (code.isascii() and code.isdigit()) or len(code) != 6:
+        return None
     
-    totp = pyotp.TOTP(secret)
-    return totp.verify(code, valid_window=1)
+    totp = _totp(secret)
+    current = int(time.time()) // totp.interval
+    for step in (current, current - 1, current + 1):
+        if hmac.compare_digest(totp.generate_otp(step), code):
+            return step
+    return None
 
 
 # ==================== BACKUP CODES ====================
 
-def generate_backup_codes() -> Tuple[List[str], str]:
+def _hash_backup_code(code: str) -> bytes:
+    """Keyed BLAKE2b digest of a normalized backup code"""
+    return hashlib.blake2b(
+        code.encode(), key=BACKUP_CODE_KEY, digest_size=BACKUP_CODE_DIGEST_SIZE
+    ).digest()
+
+
+def generate_backup_codes() -> Tuple[List[str], bytes]:
     """
     Generate backup codes for account recovery.
-    Returns (list of codes, hashed codes string for storage)
+    Returns (list of codes, packed code hashes for storage)
     """
-    codes = []
-    for _ in range(BACKUP_CODES_COUNT):
-        # Generate random code
-        code = secrets.token_hex(BACKUP_CODE_LENGTH // 2).upper()
-        # Format as XXXX-XXXX
-        formatted = f"{code[:4]}-{code[4:]}"
-        codes.append(formatted)
+    # Draw the entropy for all codes at once, then format each as XXXX-XXXX
+    hex_chars = secrets.token_bytes(BACKUP_CODES_COUNT * BACKUP_CODE_LENGTH // 2).hex().upper()
+    half = BACKUP_CODE_LENGTH // 2
+    codes = [
+        f"{hex_chars[i:i + half]}-{hex_chars[i + half:i + BACKUP_CODE_LENGTH]}"
+        for i in range(0, len(hex_chars), BACKUP_CODE_LENGTH)
+    ]
     
-    # Store as comma-separated for simplicity
-    # In production, these should be hashed individually
-    stored = ",".join(codes)
+    # Store fixed-width hashes back to back, never the codes themselves
+    stored = b"".join(_hash_backup_code(code) for code in codes)
     
     return codes, stored
 
 
-def verify_backup_code(stored_codes: str, code: str) -> Tuple[bool, Optional[str]]:
+def verify_backup_code(
+    stored_codes: Union[bytes, str, None], code: str
+) -> Tuple[bool, Optional[bytes]]:
     """
     Verify a backup code.
-    Returns (is_valid, remaining_codes_string)
+    Returns (is_valid, remaining_codes)
     """
     if not stored_codes or not code:
         return False, stored_codes
@@ -112,21 +140,35 @@ def verify_backup_code(stored_codes: str, code: str) -> Tuple[bool, Optional[str
     if "-" not in code and len(code) == 8:
         code = f"{code[:4]}-{code[4:]}"
     
-    codes = stored_codes.split(",")
+    if isinstance(stored_codes, str):
+        # Legacy plaintext CSV, re-stored as hashes on first use
+        stored_codes = b"".join(_hash_backup_code(c) for c in stored_codes.split(","))
+    
+    # Compare against every stored hash in constant time so the response
+    # time doesn't reveal how far into the list a match was
+    digest = _hash_backup_code(code)
+    size = BACKUP_CODE_DIGEST_SIZE
+    view = memoryview(stored_codes)
+    match_index = -1
+    for i in range(len(stored_codes) // size):
+        if hmac.compare_digest(view[i * size:(i + 1) * size], digest):
+            match_index = i
     
-    if code in codes:
+    if match_index >= 0:
         # Remove used code
-        codes.remove(code)
-        return True, ",".join(codes) if codes else None
+        remaining = stored_codes[:match_index * size] + stored_codes[(match_index + 1) * size:]
+        return True, remaining or None
     
     return False, stored_codes
 
 
-def get_backup_codes_count(stored_codes: str) -> int:
+def get_backup_codes_count(stored_codes: Union[bytes, str, None]) -> int:
     """Get number of remaining backup codes"""
     if not stored_codes:
         return 0
-    return len(stored_codes.split(","))
+    if isinstance(stored_codes, str):
+        return len(stored_codes.split(","))
+    return len(stored_codes) // BACKUP_CODE_DIGEST_SIZE
 
 
 # ==================== 2FA STATUS ====================
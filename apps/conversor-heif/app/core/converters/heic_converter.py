@@ -1,4 +1,6 @@
 import os
+import io
+import asyncio
 from pathlib import Path
 from typing import Optional, Tuple
 from PIL import Image
@@ -25,7 +27,8 @@ class HEICConverter:
         input_path: Path, 
         output_path: Path, 
         quality: int = None,
-        compression: int = None
+        compression: int = None,
+        data: Optional[bytes] = None
     ) -> dict:
         """
         Convert a HEIC/HEIF file to JPG
@@ -35,75 +38,73 @@ class HEICConverter:
             output_path: Path for output JPG file
             quality: JPG quality (1-100)
             compression: Compression level (1-100)
+            data: File contents already in memory; input_path then only names the file
             
         Returns:
             dict: Conversion result with metadata
         """
+        return await asyncio.to_thread(
+            self._convert_file_sync, input_path, output_path, quality, compression, data
+        )
+    
+    def _convert_file_sync(
+        self, 
+        input_path: Path, 
+        output_path: Path, 
+        quality: int = None,
+        compression: int = None,
+        data: Optional[bytes] = None
+    ) -> dict:
+        """Decode the HEIC/HEIF source and write it as JPG"""
         try:
-            logger.debug(f"🔄 HEICConverter: Starting conversion of {input_path} to {output_path}")
+            logger.debug("🔄 HEICConverter: Starting conversion of %s to %s", input_path, output_path)
             
             # Set quality (use compression if quality not specified)
             final_quality = quality or compression or self.default_quality
             final_quality = max(1, min(100, final_quality))
-            logger.debug(f"🎛️ Using quality: {final_quality}")
-            
-            # Check if input file exists
-            if not input_path.exists():
-                raise FileNotFoundError(f"Input file not found: {input_path}")
-            
-            logger.debug(f"📁 Input file size: {os.path.getsize(input_path)} bytes")
-            
-            # Ensure HEIF opener is registered
-            try:
-                pillow_heif.register_heif_opener()
-                logger.debug("✅ pillow_heif registered successfully")
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to register pillow_heif: {e}")
-            
-            # Try to open with pillow_heif first
-            img = None
-            try:
-                logger.debug("🔍 Attempting to open with pillow_heif...")
-                heif_file = pillow_heif.read_heif(str(input_path))
-                img = heif_file.to_pillow()
-                logger.debug(f"✅ Opened with pillow_heif: {img.size} {img.mode}")
-            except Exception as e:
-                logger.debug(f"⚠️ pillow_heif failed: {e}, trying PIL fallback...")
-                # Fallback to regular PIL
-                try:
-                    with Image.open(input_path) as pil_img:
-                        img = pil_img.copy()
-                    logger.debug(f"✅ Opened with PIL: {img.size} {img.mode}")
-                except Exception as pil_e:
-                    raise Exception(f"Failed to open with both pillow_heif and PIL: pillow_heif={e}, PIL={pil_e}")
-            
-            # Convert to RGB if necessary (JPG doesn't support RGBA)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                logger.debug(f"🎨 Converting from {img.mode} to RGB")
-                img = img.convert('RGB')
-            
-            # Get original image info
-            original_size = os.path.getsize(input_path)
-            original_dimensions = img.size
-            logger.debug(f"📊 Original: {original_dimensions} ({original_size} bytes)")
-            
-            # Create output directory if it doesn't exist
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Save as JPG with specified quality
-            logger.debug(f"💾 Saving as {self.output_format} with quality {final_quality}")
-            img.save(
-                output_path,
-                format=self.output_format,
-                quality=final_quality,
-                optimize=True
-            )
+            logger.debug("🎛️ Using quality: %s", final_quality)
+            
+            if data is None:
+                # A single stat both checks the input exists and gets its size
+                original_size = os.path.getsize(input_path)
+                source = input_path
+            else:
+                original_size = len(data)
+                source = io.BytesIO(data)
+            
+            # The opener registered in __init__ routes HEIC/HEIF through pillow_heif,
+            # decoding straight into the PIL image with no intermediate HeifFile copy
+            with Image.open(source) as img:
+                img.load()
+                logger.debug("✅ Opened: %s %s", img.size, img.mode)
+                
+                # Get original image info
+                original_dimensions = img.size
+                logger.debug("📊 Original: %s (%d bytes)", original_dimensions, original_size)
+                
+                # Convert to RGB if necessary (JPG doesn't support RGBA)
+                if img.mode in ('RGBA', 'LA', 'P'):
+                    logger.debug("🎨 Converting from %s to RGB", img.mode)
+                    img = img.convert('RGB')
+                
+                # Create output directory if it doesn't exist
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                
+                # Save as JPG with specified quality
+                logger.debug("💾 Saving as %s with quality %s", self.output_format, final_quality)
+                img.save(
+                    output_path,
+                    format=self.output_format,
+                    quality=final_quality,
+                    subsampling="4:2:0"
+                )
+                output_dimensions = img.size
             
             # Get output file info
             output_size = os.path.getsize(output_path)
             compression_ratio = (1 - (output_size / original_size)) * 100
             
-            logger.info(f"✅ HEIC conversion successful: {input_path.name} -> {output_path.name} ({original_size} -> {output_size} bytes)")
+            logger.info("✅ HEIC conversion successful: %s -> %s (%d -> %d bytes)", input_path.name, output_path.name, original_size, output_size)
             
             return {
                 "success": True,
@@ -114,12 +115,12 @@ class HEICConverter:
                 "compression_ratio": round(compression_ratio, 2),
                 "quality": final_quality,
                 "original_dimensions": original_dimensions,
-                "output_dimensions": img.size,
+                "output_dimensions": output_dimensions,
                 "format": self.output_format
             }
             
         except Exception as e:
-            logger.error(f"❌ HEIC conversion failed for {input_path}: {type(e).__name__} - {str(e)}")
+            logger.error("❌ HEIC conversion failed for %s: %s - %s", input_path, type(e).__name__, e)
             return {
                 "success": False,
                 "input_path": str(input_path),
@@ -147,24 +148,24 @@ class HEICConverter:
         Returns:
             list: List of conversion results
         """
-        results = []
+        # One conversion per core at a time bounds peak memory from decoded frames
+        semaphore = asyncio.Semaphore(os.cpu_count() or 1)
         
-        for input_file in input_files:
+        async def convert_one(input_file: Path) -> dict:
             # Generate output filename
             output_filename = self._generate_output_filename(input_file)
             output_path = output_dir / output_filename
             
             # Convert file
-            result = await self.convert_file(
-                input_file, 
-                output_path, 
-                quality, 
-                compression
-            )
-            
-            results.append(result)
+            async with semaphore:
+                return await self.convert_file(
+                    input_file, 
+                    output_path, 
+                    quality, 
+                    compression
+                )
         
-        return results
+        return list(await asyncio.gather(*(convert_one(f) for f in input_files)))
     
     def _generate_output_filename(self, input_path: Path) -> str:
         """Generate output filename with JPG extension"""
@@ -1,10 +1,15 @@
 import os
+import asyncio
+import zipfile
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 import fitz  # PyMuPDF
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
 from PIL import Image
 import io
 from config.settings import settings
+from app.utils.logger import logger
 
 
 class PDFConverter:
@@ -16,13 +21,15 @@ class PDFConverter:
         self.max_pages = settings.max_pdf_pages
         self.max_images_per_page = settings.max_images_per_page
         self.default_quality = settings.default_quality
+        self.zip_compression = zipfile.ZIP_DEFLATED if settings.zip_compression == "deflate" else zipfile.ZIP_STORED
     
     async def extract_images_from_pdf(
         self, 
         pdf_path: Path, 
         output_dir: Path,
         quality: int = None,
-        compression: int = None
+        compression: int = None,
+        data: Optional[bytes] = None
     ) -> dict:
         """
         Extract all images from a PDF file and convert to JPG
@@ -32,17 +39,31 @@ class PDFConverter:
             output_dir: Directory for output images
             quality: JPG quality (1-100)
             compression: Compression level (1-100)
+            data: File contents already in memory; pdf_path then only names the file
             
         Returns:
             dict: Extraction and conversion results
         """
+        return await asyncio.to_thread(
+            self._extract_images_from_pdf_sync, pdf_path, output_dir, quality, compression, data
+        )
+    
+    def _extract_images_from_pdf_sync(
+        self, 
+        pdf_path: Path, 
+        output_dir: Path,
+        quality: int = None,
+        compression: int = None,
+        data: Optional[bytes] = None
+    ) -> dict:
+        """Extract the PDF's images as JPGs, bundled in a ZIP when there are several"""
         try:
             # Set quality
             final_quality = quality or compression or self.default_quality
             final_quality = max(1, min(100, final_quality))
             
             # Open PDF
-            pdf_document = fitz.open(pdf_path)
+            pdf_document = fitz.open(pdf_path) if data is None else fitz.open(stream=data, filetype="pdf")
             total_pages = len(pdf_document)
             
             if total_pages > self.max_pages:
@@ -53,35 +74,52 @@ class PDFConverter:
                 }
             
             extracted_images = []
-            total_images = 0
             
-            # Process each page
-            for page_num in range(total_pages):
-                page = pdf_document[page_num]
-                page_images = await self._extract_images_from_page(
-                    page, page_num, output_dir, final_quality
-                )
+            # Images are written into the ZIP as they are encoded, so nothing is re-read from disk
+            output_dir.mkdir(parents=True, exist_ok=True)
+            zip_path = self._get_zip_path(output_dir, pdf_path.stem)
+            max_workers = min(8, os.cpu_count() or 1)
+            with zipfile.ZipFile(zip_path, 'w', self.zip_compression) as zipf, \
+                    ThreadPoolExecutor(max_workers=max_workers) as executor:
+                
+                def collect(future: Future):
+                    converted = future.result()
+                    if converted is None:
+                        return
+                    
+                    image_info, jpeg_bytes = converted
+                    zipf.writestr(image_info["filename"], jpeg_bytes)
+                    extracted_images.append(image_info)
                 
-                if page_images:
-                    extracted_images.extend(page_images)
-                    total_images += len(page_images)
+                # PyMuPDF is not thread-safe, so pages are read and their images decoded here
+                # one by one, while the JPG encoding runs concurrently in the pool. Decoded
+                # frames are full resolution, so only a few conversions are kept in flight;
+                # the oldest is collected first so the ZIP layout stays in page order
+                max_in_flight = 2 * max_workers
+                pending = deque()
+                for page_num in range(total_pages):
+                    page = pdf_document[page_num]
+                    pending.extend(self._extract_images_from_page(
+                        page, page_num, output_dir, final_quality, executor
+                    ))
+                    while len(pending) > max_in_flight:
+                        collect(pending.popleft())
                 
-                # Check limit per page
-                if len(page_images) > self.max_images_per_page:
-                    break
+                while pending:
+                    collect(pending.popleft())
             
             pdf_document.close()
             
-            # Create ZIP file if multiple images
-            zip_path = None
-            if len(extracted_images) > 1:
-                zip_path = await self._create_zip_file(extracted_images, output_dir, pdf_path.stem)
+            # Only keep the ZIP file if multiple images
+            if len(extracted_images) <= 1:
+                zip_path.unlink(missing_ok=True)
+                zip_path = None
             
             return {
                 "success": True,
                 "pdf_path": str(pdf_path),
                 "total_pages": total_pages,
-                "total_images": total_images,
+                "total_images": len(extracted_images),
                 "extracted_images": extracted_images,
                 "zip_path": str(zip_path) if zip_path else None,
                 "quality": final_quality
@@ -95,13 +133,14 @@ class PDFConverter:
                 "error_type": type(e).__name__
             }
     
-    async def _extract_images_from_page(
+    def _extract_images_from_page(
         self, 
         page, 
         page_num: int, 
         output_dir: Path, 
-        quality: int
-    ) -> List[Dict]:
+        quality: int,
+        executor: Executor
+    ) -> List[Future]:
         """
         Extract images from a single PDF page
         
@@ -110,62 +149,131 @@ class PDFConverter:
             page_num: Page number (0-indexed)
             output_dir: Output directory
             quality: JPG quality
+            executor: Pool the image conversions are submitted to
             
         Returns:
-            List of extracted image information
+            List of futures resolving to the result of _convert_page_image
         """
-        images = []
+        futures = []
+        doc = page.parent
         
-        # Get image list from page
-        image_list = page.get_images()
+        # Get image list from page, capped to the per-page limit
+        image_list = page.get_images()[:self.max_images_per_page]
         
         for img_index, img in enumerate(image_list):
             try:
                 # Get image data
-                xref = img[0]
-                base_image = page.parent.extract_image(xref)
-                image_bytes = base_image["image"]
-                
-                # Convert to PIL Image
-                pil_image = Image.open(io.BytesIO(image_bytes))
-                
-                # Convert to RGB if necessary
-                if pil_image.mode in ('RGBA', 'LA', 'P'):
-                    pil_image = pil_image.convert('RGB')
+                image, dimensions = self._read_page_image(doc, img)
                 
                 # Generate filename with page number and image index
                 filename = self._generate_page_image_filename(
                     page_num + 1, img_index, output_dir
                 )
                 
-                # Save as JPG
-                pil_image.save(
-                    filename,
-                    format=self.output_format,
-                    quality=quality,
-                    optimize=True
-                )
-                
-                # Get file info
-                file_size = os.path.getsize(filename)
-                
-                images.append({
-                    "filename": filename.name,
-                    "path": str(filename),
-                    "page": page_num + 1,
-                    "image_index": img_index,
-                    "dimensions": pil_image.size,
-                    "size": file_size,
-                    "format": self.output_format,
-                    "quality": quality
-                })
+                futures.append(executor.submit(
+                    self._convert_page_image, image, dimensions, filename, page_num, img_index, quality
+                ))
                 
             except Exception as e:
                 # Log error but continue with other images
-                print(f"Error extracting image {img_index} from page {page_num}: {e}")
+                logger.error("Error extracting image %d from page %d: %s", img_index, page_num, e)
                 continue
         
-        return images
+        return futures
+    
+    def _read_page_image(
+        self, 
+        doc, 
+        img: tuple
+    ) -> Tuple[Union[bytes, Image.Image], Tuple[int, int]]:
+        """
+        Read an embedded image from the PDF (calls into PyMuPDF, so not thread-safe)
+        
+        Args:
+            doc: PDF document object
+            img: Image entry as returned by page.get_images()
+            
+        Returns:
+            Tuple of the image (original JPEG bytes or decoded pixels) and its dimensions
+        """
+        xref = img[0]
+        
+        if img[8] == "DCTDecode":
+            base_image = doc.extract_image(xref)
+            if base_image["ext"] == "jpeg" and base_image["colorspace"] in (1, 3):
+                # Embedded grayscale/RGB JPEG: keep the original stream as is
+                return base_image["image"], (base_image["width"], base_image["height"])
+        
+        # Decode straight to pixels; extract_image would re-encode them as PNG first
+        pix = fitz.Pixmap(doc, xref)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        
+        # frombuffer wraps the samples copy PyMuPDF already made instead of copying it again
+        mode = "L" if pix.n == 1 else "RGB"
+        pil_image = Image.frombuffer(mode, (pix.width, pix.height), pix.samples, "raw", mode, pix.stride, 1)
+        return pil_image, pil_image.size
+    
+    def _convert_page_image(
+        self, 
+        image: Union[bytes, Image.Image], 
+        dimensions: Tuple[int, int], 
+        filename: Path, 
+        page_num: int, 
+        img_index: int, 
+        quality: int
+    ) -> Optional[Tuple[Dict, bytes]]:
+        """
+        Convert an extracted PDF image to JPG and write it to disk
+        
+        Args:
+            image: Original JPEG bytes or decoded image, as returned by _read_page_image
+            dimensions: Image dimensions
+            filename: Output file path
+            page_num: Page number (0-indexed)
+            img_index: Image index on the page
+            quality: JPG quality
+            
+        Returns:
+            Tuple of image information and JPG bytes, or None on failure
+        """
+        try:
+            if isinstance(image, bytes):
+                jpeg_bytes = image
+            else:
+                # Encode as JPG once, then write the same bytes to disk and ZIP
+                buffer = io.BytesIO()
+                image.save(
+                    buffer,
+                    format=self.output_format,
+                    quality=quality,
+                    subsampling="4:2:0"
+                )
+                jpeg_bytes = buffer.getvalue()
+            
+            filename.write_bytes(jpeg_bytes)
+            
+            # Get file info
+            file_size = len(jpeg_bytes)
+            
+            image_info = {
+                "filename": filename.name,
+                "path": str(filename),
+                "page": page_num + 1,
+                "image_index": img_index,
+                "dimensions": dimensions,
+                "size": file_size,
+                "format": self.output_format,
+                "quality": quality
+            }
+            return image_info, jpeg_bytes
+            
+        except Exception as e:
+            # Log error but continue with other images
+            logger.error("Error extracting image %d from page %d: %s", img_index, page_num, e)
+            return None
     
     def _generate_page_image_filename(
         self, 
@@ -193,36 +301,19 @@ class PDFConverter:
         
         return output_dir / filename
     
-    async def _create_zip_file(
-        self, 
-        images: List[Dict], 
-        output_dir: Path, 
-        pdf_name: str
-    ) -> Path:
+    def _get_zip_path(self, output_dir: Path, pdf_name: str) -> Path:
         """
-        Create ZIP file containing all extracted images
+        Generate path for the ZIP file containing all extracted images
         
         Args:
-            images: List of image information
             output_dir: Output directory
             pdf_name: Original PDF name
             
         Returns:
-            Path to created ZIP file
+            Path to ZIP file
         """
-        import zipfile
-        
         zip_filename = f"{pdf_name}_extracted_images.zip"
-        zip_path = output_dir / zip_filename
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for img_info in images:
-                img_path = Path(img_info['path'])
-                if img_path.exists():
-                    # Add to ZIP with relative path
-                    zipf.write(img_path, img_path.name)
-        
-        return zip_path
+        return output_dir / zip_filename
     
     def get_supported_formats(self) -> list:
         """Get list of supported input formats"""
@@ -1,15 +1,15 @@
 import os
+import io
 import asyncio
 import uuid
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import UploadFile
-import aiofiles
 import zipfile
 import tempfile
 import shutil
-import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from app.core.converters.heic_converter import HEICConverter
 from app.core.converters.pdf_converter import PDFConverter
@@ -18,6 +18,42 @@ from app.utils.logger import logger
 from config.settings import settings
 
 
+# Conversion path for each accepted file extension
+SUFFIX_KINDS = {
+    '.heic': "heic",
+    '.heif': "heic",
+    '.pdf': "pdf",
+    '.png': "image",
+    '.jpg': "image",
+    '.jpeg': "image",
+    '.bmp': "image",
+    '.tiff': "image",
+    '.webp': "image",
+}
+
+# Conversions never run on the event loop: the HEIC and PDF converters use asyncio.to_thread and
+# plain image encodes get this pool, so they can't starve the default executor that handles upload
+# spills and ZIP writes. Threads rather than processes: Pillow releases the GIL while decoding/encoding
+_ENCODE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="jpg-encode")
+
+# Bounds how many files are converted at once, whatever their type, across all concurrent requests
+CONVERT_SEM = asyncio.Semaphore(settings.max_concurrency or os.cpu_count() or 1)
+
+# Present in a task directory while the task is being processed, so the expiry sweep of any
+# worker process leaves it alone. Removing it bumps the directory mtime, which starts the
+# retention clock when the task finishes. A marker older than the max age is from a crashed task
+ACTIVE_TASK_MARKER = ".active"
+ACTIVE_TASK_MAX_AGE_SECONDS = 3600
+
+
+def _iter_temp_files(task_dir: Path):
+    """Yield paths of the spilled temp_* uploads in a task directory, in one directory scan"""
+    with os.scandir(task_dir) as entries:
+        for entry in entries:
+            if entry.name.startswith("temp_") and entry.is_file():
+                yield entry.path
+
+
 class BatchProcessor:
     """Processes multiple files (HEIC/PDF/Images) in batch with progress tracking"""
     
@@ -25,8 +61,9 @@ class BatchProcessor:
         self.heic_converter = HEICConverter()
         self.pdf_converter = PDFConverter()
         self.file_validator = FileValidator()
-        self.temp_dir = Path("temp")
-        self.temp_dir.mkdir(exist_ok=True)
+        self.temp_dir = settings.temp_dir
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.zip_compression = zipfile.ZIP_DEFLATED if settings.zip_compression == "deflate" else zipfile.ZIP_STORED
     
     async def process_files(
         self, 
@@ -45,99 +82,68 @@ class BatchProcessor:
         Returns:
             Dict with processing results and download info
         """
+        active_marker = None
         try:
             # Generate unique task ID
             task_id = str(uuid.uuid4())
             task_dir = self.temp_dir / task_id
             task_dir.mkdir(exist_ok=True)
+            active_marker = task_dir / ACTIVE_TASK_MARKER
+            active_marker.touch()
             
             logger.conversion_start(task_id, len(files), "mixed")
             
             # Separate files by type
-            heic_files = []
-            pdf_files = []
-            image_files = []
+            buckets = {"heic": [], "pdf": [], "image": []}
+            jobs = []
+            # Files convert concurrently, so two uploads must never share an output path
+            used_stems = set()
             
-            logger.info(f"Processing {len(files)} uploaded files for task {task_id}")
+            logger.info("Processing %d uploaded files for task %s", len(files), task_id)
             for i, file in enumerate(files):
-                logger.debug(f"File {i}: {file.filename} (size: {file.size}, type: {file.content_type})")
+                kind = SUFFIX_KINDS.get(os.path.splitext(file.filename)[1].lower())
+                if kind is None:
+                    logger.warning("Unknown file type: %s", file.filename)
+                    continue
                 
-                if file.filename.lower().endswith(('.heic', '.heif')):
-                    heic_files.append(file)
-                    logger.debug(f"  Categorized as HEIC file: {file.filename}")
-                elif file.filename.lower().endswith('.pdf'):
-                    pdf_files.append(file)
-                    logger.debug(f"  Categorized as PDF file: {file.filename}")
-                elif file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.webp')):
-                    image_files.append(file)
-                    logger.debug(f"  Categorized as Image file: {file.filename}")
-                else:
-                    logger.warning(f"Unknown file type: {file.filename}")
-            
-            logger.info(f"File distribution: {len(heic_files)} HEIC, {len(pdf_files)} PDF, {len(image_files)} Images")
-            
-            # Process files in parallel
-            tasks = []
-            
-            # Process HEIC files
-            if heic_files:
-                heic_task = self._process_heic_files(heic_files, task_dir, quality, compression)
-                tasks.append(heic_task)
-            
-            # Process PDF files
-            if pdf_files:
-                pdf_task = self._process_pdf_files(pdf_files, task_dir, quality, compression)
-                tasks.append(pdf_task)
+                buckets[kind].append(file)
+                jobs.append((file, kind, self._unique_stem(Path(file.filename).stem, used_stems)))
+                logger.debug("File %d: %s (size: %s, type: %s) -> %s", i, file.filename, file.size, file.content_type, kind)
             
-            # Process other image files
-            if image_files:
-                image_task = self._process_image_files(image_files, task_dir, quality, compression)
-                tasks.append(image_task)
+            heic_files, pdf_files, image_files = buckets["heic"], buckets["pdf"], buckets["image"]
+            logger.info("File distribution: %d HEIC, %d PDF, %d Images", len(heic_files), len(pdf_files), len(image_files))
             
-            # Wait for all tasks to complete
-            logger.info(f"Waiting for {len(tasks)} tasks to complete...")
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            logger.info(f"Got {len(results)} task results")
-            
-            # Combine results - FIXED: Properly handle different result types
+            # Every file converts on its own, and results go into the ZIP as soon as
+            # they finish instead of waiting for the slowest file of each type
             all_results = []
-            for i, result in enumerate(results):
-                logger.debug(f"Processing task result {i}: type={type(result)}")
+            zip_path = self.temp_dir / f"{task_id}.zip"
+            # The 1 MiB buffer coalesces ZipFile's small header and data writes
+            with open(zip_path, 'wb', buffering=1 << 20) as raw, \
+                    zipfile.ZipFile(raw, 'w', self.zip_compression) as zipf:
+                pending = [
+                    asyncio.ensure_future(self._convert_one(file, kind, stem, task_dir, quality, compression))
+                    for file, kind, stem in jobs
+                ]
+                for next_done in asyncio.as_completed(pending):
+                    try:
+                        result = await next_done
+                    except Exception as e:
+                        logger.exception(e, f"conversion task for {task_id}")
+                        result = {
+                            "success": False,
+                            "error": str(e),
+                            "error_type": type(e).__name__
+                        }
+                    
+                    all_results.append(result)
+                    # Copying runs in a worker thread; only this loop writes, so no lock is needed
+                    await asyncio.to_thread(self._append_to_zip, zipf, result)
                 
-                if isinstance(result, list):
-                    logger.debug(f"  Result is list with {len(result)} items")
-                    all_results.extend(result)
-                    for j, item in enumerate(result):
-                        logger.debug(f"    Item {j}: success={item.get('success')}")
-                elif isinstance(result, dict):
-                    logger.debug(f"  Result is dict: success={result.get('success')}")
-                    # Handle both successful and failed results
-                    if result.get('success'):
-                        all_results.append(result)
-                        logger.debug(f"    Added successful result")
-                    elif 'error' in result:
-                        all_results.append(result)
-                        logger.debug(f"    Added failed result")
-                elif isinstance(result, Exception):
-                    logger.error(f"Task {i} returned exception: {result}")
-                    # Handle exceptions from asyncio.gather
-                    all_results.append({
-                        "success": False,
-                        "error": str(result),
-                        "error_type": type(result).__name__
-                    })
-                    logger.debug(f"    Added exception result")
+                zip_file_count = len(zipf.namelist())
             
-            logger.info(f"Final results: {len(all_results)} items")
             successful_results = [r for r in all_results if r.get('success')]
-            failed_results = [r for r in all_results if not r.get('success')]
-            logger.info(f"Success: {len(successful_results)}, Failed: {len(failed_results)}")
-            
-            # Create final ZIP file
-            zip_path = await self._create_final_zip(task_dir, task_id, all_results)
-            
-            # Schedule cleanup after 5 minutes to allow downloads
-            self._schedule_delayed_cleanup(task_dir, task_id, delay_minutes=5)
+            logger.info("Success: %d, Failed: %d", len(successful_results), len(all_results) - len(successful_results))
+            logger.zip_creation(task_id, zip_path, zip_file_count, zip_path.stat().st_size)
             
             return {
                 "success": True,
@@ -146,7 +152,7 @@ class BatchProcessor:
                 "heic_files": len(heic_files),
                 "pdf_files": len(pdf_files),
                 "image_files": len(image_files),
-                "processed_files": len([r for r in all_results if r.get('success')]),
+                "processed_files": len(successful_results),
                 "download_url": f"/api/download/{task_id}",
                 "zip_path": str(zip_path),
                 "results": all_results
@@ -160,135 +166,149 @@ class BatchProcessor:
                 "error": str(e),
                 "error_type": type(e).__name__
             }
+        
+        finally:
+            if active_marker is not None:
+                active_marker.unlink(missing_ok=True)
+    
+    @staticmethod
+    def _unique_stem(stem: str, used_stems: set) -> str:
+        """Return stem, or stem_2, stem_3... if already in used_stems (case-insensitive), and record it"""
+        unique, n = stem, 1
+        while unique.lower() in used_stems:
+            n += 1
+            unique = f"{stem}_{n}"
+        used_stems.add(unique.lower())
+        return unique
     
-    async def _process_heic_files(
+    async def _convert_one(
         self, 
-        files: List[UploadFile], 
+        file: UploadFile, 
+        kind: str, 
+        stem: str, 
         output_dir: Path, 
         quality: int, 
         compression: int
-    ) -> List[Dict]:
-        """Process HEIC files and return conversion results"""
-        results = []
-        
-        logger.info(f"🖼️ Processing {len(files)} HEIC files...")
-        for i, file in enumerate(files):
-            logger.info(f"🖼️ Processing HEIC file {i+1}/{len(files)}: {file.filename}")
+    ) -> Dict:
+        """Save one uploaded file and convert it according to its type ("heic", "pdf" or "image"), naming outputs after stem"""
+        async with CONVERT_SEM:
+            logger.info("🔄 Processing %s file: %s", kind, file.filename)
             try:
-                # Save uploaded file temporarily
-                temp_path = output_dir / f"temp_{file.filename}"
-                logger.debug(f"💾 Saving HEIC temp file to: {temp_path}")
+                temp_path = output_dir / f"temp_{stem}{os.path.splitext(file.filename)[1]}"
                 
-                async with aiofiles.open(temp_path, 'wb') as f:
-                    content = await file.read()
-                    await f.write(content)
-                    logger.debug(f"💾 Saved {len(content)} bytes to HEIC temp file")
-                
-                # Convert file
-                output_filename = self.heic_converter._generate_output_filename(temp_path)
-                output_path = output_dir / output_filename
-                logger.debug(f"🔄 Converting HEIC to: {output_path}")
-                
-                result = await self.heic_converter.convert_file(
-                    temp_path, output_path, quality, compression
-                )
+                if file.size is not None and file.size <= settings.max_in_memory_size:
+                    # Small upload: hand the bytes straight to the converter, temp_path only names it
+                    await file.seek(0)
+                    data = await file.read()
+                else:
+                    # Save uploaded file temporarily
+                    data = None
+                    saved = await self._spill_upload(file, temp_path)
+                    logger.debug("💾 Saved %d bytes to temp file: %s", saved, temp_path)
                 
-                logger.info(f"📊 HEIC Conversion result: {result}")
+                if kind == "heic":
+                    output_path = output_dir / self.heic_converter._generate_output_filename(temp_path)
+                    result = await self.heic_converter.convert_file(
+                        temp_path, output_path, quality, compression, data=data
+                    )
+                elif kind == "pdf":
+                    pdf_output_dir = output_dir / f"pdf_{stem}"
+                    result = await self.pdf_converter.extract_images_from_pdf(
+                        temp_path, pdf_output_dir, quality, compression, data=data
+                    )
+                else:
+                    output_path = output_dir / f"{stem}.jpg"
+                    result = await self._convert_image_to_jpg(
+                        temp_path, output_path, quality, compression, data=data
+                    )
                 
                 if result['success']:
-                    results.append(result)
-                    logger.info(f"✅ Successfully converted HEIC: {file.filename}")
+                    logger.info("✅ Successfully converted: %s", file.filename)
                 else:
-                    logger.error(f"❌ Failed to convert HEIC: {file.filename} - {result.get('error', 'Unknown error')}")
-                    results.append(result)
+                    logger.error("❌ Failed to convert: %s - %s", file.filename, result.get('error', 'Unknown error'))
                 
-                # Don't delete temp file yet - we need it for the ZIP
-                # temp_path.unlink(missing_ok=True)
+                # Don't delete temp file yet - cleanup is scheduled once the ZIP is served
+                return result
                 
             except Exception as e:
-                error_msg = str(e)
-                logger.exception(e, f"processing HEIC file {file.filename}")
-                results.append({
+                logger.exception(e, f"processing file {file.filename}")
+                return {
                     "success": False,
                     "filename": file.filename,
-                    "error": error_msg
-                })
-        
-        logger.info(f"🖼️ HEIC processing complete. {len([r for r in results if r.get('success')])} successful, {len([r for r in results if not r.get('success')])} failed")
-        return results
+                    "error": str(e)
+                }
     
-    async def _process_image_files(
-        self, 
-        files: List[UploadFile], 
-        output_dir: Path, 
-        quality: int, 
-        compression: int
-    ) -> List[Dict]:
-        """Process image files and return conversion results"""
-        results = []
+    async def _spill_upload(self, file: UploadFile, dest: Path, chunk_size: int = 1 << 20) -> int:
+        """Copy an uploaded file to disk chunk by chunk, returning the number of bytes written"""
+        await file.seek(0)
+        # One worker thread for the whole copy instead of a thread hop per chunk
+        return await asyncio.to_thread(self._spill_upload_sync, file.file, dest, chunk_size)
+    
+    def _spill_upload_sync(self, src, dest: Path, chunk_size: int) -> int:
+        """Copy src to dest, returning the number of bytes written"""
+        with open(dest, 'wb', buffering=chunk_size) as f:
+            shutil.copyfileobj(src, f, chunk_size)
+            return f.tell()
+    
+    def _append_to_zip(self, zipf: zipfile.ZipFile, result: Dict):
+        """Add the output files of one conversion result to the task ZIP"""
+        if not result.get('success'):
+            return
         
-        print(f"🖼️ Processing {len(files)} image files...")
-        for i, file in enumerate(files):
-            print(f"🖼️ Processing image file {i+1}/{len(files)}: {file.filename}")
-            try:
-                # Save uploaded file temporarily
-                temp_path = output_dir / f"temp_{file.filename}"
-                print(f"💾 Saving temp file to: {temp_path}")
-                
-                async with aiofiles.open(temp_path, 'wb') as f:
-                    content = await file.read()
-                    await f.write(content)
-                    print(f"💾 Saved {len(content)} bytes to temp file")
-                
-                # Convert to JPG
-                output_filename = Path(file.filename).stem + ".jpg"
-                output_path = output_dir / output_filename
-                print(f"🔄 Converting to: {output_path}")
-                
-                result = await self._convert_image_to_jpg(temp_path, output_path, quality, compression)
-                print(f"📊 Conversion result: {result}")
-                
-                if result['success']:
-                    results.append(result)
-                    print(f"✅ Successfully converted: {file.filename}")
-                else:
-                    print(f"❌ Failed to convert: {file.filename} - {result.get('error', 'Unknown error')}")
-                    results.append(result)
-                
-                # Don't delete temp file yet - we need it for the ZIP
-                # temp_path.unlink(missing_ok=True)
-                
-            except Exception as e:
-                error_msg = str(e)
-                print(f"❌ Exception processing {file.filename}: {error_msg}")
-                results.append({
-                    "success": False,
-                    "filename": file.filename,
-                    "error": error_msg
-                })
+        if 'output_path' in result:
+            # HEIC/Image conversion result
+            file_path = Path(result['output_path'])
+            entries = [(file_path, file_path.name)]
+        elif 'extracted_images' in result:
+            # PDF extraction result
+            entries = [(Path(img_info['path']), img_info['filename']) for img_info in result['extracted_images']]
+        else:
+            logger.warning("Unknown result structure: %s", list(result.keys()))
+            return
         
-        print(f"🖼️ Image processing complete. {len([r for r in results if r.get('success')])} successful, {len([r for r in results if not r.get('success')])} failed")
-        return results
+        for path, arcname in entries:
+            if arcname in zipf.NameToInfo:
+                # e.g. page_1a.jpg from two PDFs; the directory name is unique per upload
+                arcname = f"{path.parent.name}_{arcname}"
+            try:
+                zipf.write(path, arcname)
+                logger.debug("📦 Added to ZIP: %s", arcname)
+            except FileNotFoundError:
+                logger.error("File not found for ZIP: %s", path)
     
     async def _convert_image_to_jpg(
         self, 
         input_path: Path, 
         output_path: Path, 
         quality: int, 
-        compression: int
+        compression: int,
+        data: Optional[bytes] = None
+    ) -> Dict:
+        """Convert any image format to JPG, reading from data instead of input_path when given"""
+        return await asyncio.get_running_loop().run_in_executor(
+            _ENCODE_POOL, self._convert_image_to_jpg_sync, input_path, output_path, quality, compression, data
+        )
+    
+    def _convert_image_to_jpg_sync(
+        self, 
+        input_path: Path, 
+        output_path: Path, 
+        quality: int, 
+        compression: int,
+        data: Optional[bytes] = None
     ) -> Dict:
-        """Convert any image format to JPG"""
+        """Decode any Pillow-readable image and write it as JPG"""
         try:
             from PIL import Image
             
             # Open image
-            with Image.open(input_path) as img:
+            with Image.open(input_path if data is None else io.BytesIO(data)) as img:
                 # Convert to RGB if necessary
                 if img.mode in ('RGBA', 'LA', 'P'):
                     img = img.convert('RGB')
                 
                 # Get original image info
-                original_size = os.path.getsize(input_path)
+                original_size = os.path.getsize(input_path) if data is None else len(data)
                 original_dimensions = img.size
                 
                 # Create output directory if it doesn't exist
@@ -299,7 +319,7 @@ class BatchProcessor:
                     output_path,
                     format="JPEG",
                     quality=quality,
-                    optimize=True
+                    subsampling="4:2:0"
                 )
                 
                 # Get output file info
@@ -327,154 +347,53 @@ class BatchProcessor:
                 "error_type": type(e).__name__
             }
     
-    async def _process_pdf_files(
-        self, 
-        files: List[UploadFile], 
-        output_dir: Path, 
-        quality: int, 
-        compression: int
-    ) -> List[Dict]:
-        """Process PDF files and return extraction results"""
-        results = []
-        
-        for file in files:
-            try:
-                # Save uploaded file temporarily
-                temp_path = output_dir / f"temp_{file.filename}"
-                async with aiofiles.open(temp_path, 'wb') as f:
-                    content = await file.read()
-                    await f.write(content)
-                
-                # Extract images from PDF
-                pdf_output_dir = output_dir / f"pdf_{file.stem}"
-                result = await self.pdf_converter.extract_images_from_pdf(
-                    temp_path, pdf_output_dir, quality, compression
-                )
-                
-                if result['success']:
-                    results.append(result)
-                
-                # Don't delete temp file yet - we need it for the ZIP
-                # temp_path.unlink(missing_ok=True)
-                
-            except Exception as e:
-                results.append({
-                    "success": False,
-                    "filename": file.filename,
-                    "error": str(e)
-                })
-        
-        return results
+    @staticmethod
+    async def run_expiry_sweeper(interval_seconds: float = 60):
+        """Periodically remove task files older than the retention window, until cancelled"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await asyncio.to_thread(BatchProcessor._sweep_expired_tasks)
     
-    async def _create_final_zip(
-        self, 
-        task_dir: Path, 
-        task_id: str, 
-        results: List[Dict]
-    ) -> Path:
-        """Create final ZIP file with all converted images"""
-        zip_path = self.temp_dir / f"{task_id}.zip"
-        
-        print(f"🔍 Creating ZIP: {zip_path}")
-        print(f"📊 Results to process: {len(results)}")
-        print(f"📁 Task directory: {task_dir}")
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Add all converted files
-            for i, result in enumerate(results):
-                print(f"📋 Processing result {i}: {result}")
-                
-                if result.get('success'):
-                    print(f"✅ Success result found")
-                    
-                    if 'output_path' in result:
-                        # HEIC/Image conversion result
-                        file_path = Path(result['output_path'])
-                        print(f"🖼️ Image file path: {file_path}")
-                        print(f"📁 File exists: {file_path.exists()}")
-                        
-                        if file_path.exists():
-                            zipf.write(file_path, file_path.name)
-                            print(f"📦 Added to ZIP: {file_path.name}")
+    @staticmethod
+    def _sweep_expired_tasks():
+        """Remove task directories and ZIP files past temp_retention_minutes, run in a worker thread"""
+        now = time.time()
+        cutoff = now - settings.temp_retention_minutes * 60
+        try:
+            with os.scandir(settings.temp_dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.stat().st_mtime > cutoff:
+                            continue
+                        # Skip the directory and ZIP of a task that is still being processed
+                        task_id = entry.name[:-len(".zip")] if entry.name.endswith(".zip") else entry.name
+                        marker = os.path.join(settings.temp_dir, task_id, ACTIVE_TASK_MARKER)
+                        try:
+                            if os.stat(marker).st_mtime > now - ACTIVE_TASK_MAX_AGE_SECONDS:
+                                continue
+                        except FileNotFoundError:
+                            pass
+                        if entry.is_dir():
+                            shutil.rmtree(entry.path, ignore_errors=True)
                         else:
-                            print(f"❌ File not found: {file_path}")
-                            
-                    elif 'extracted_images' in result:
-                        # PDF extraction result
-                        print(f"📄 PDF extraction result with {len(result['extracted_images'])} images")
-                        for img_info in result['extracted_images']:
-                            img_path = Path(img_info['path'])
-                            print(f"🖼️ PDF image path: {img_path}")
-                            print(f"📁 Image exists: {img_path.exists()}")
-                            
-                            if img_path.exists():
-                                zipf.write(img_path, img_info['filename'])
-                                print(f"📦 Added to ZIP: {img_info['filename']}")
-                            else:
-                                print(f"❌ PDF image not found: {img_path}")
-                    else:
-                        print(f"⚠️ Unknown result structure: {result.keys()}")
-                else:
-                    print(f"❌ Failed result: {result}")
-        
-        # Verify ZIP contents
-        zip_size = zip_path.stat().st_size
-        print(f"📦 ZIP created: {zip_path} (size: {zip_size} bytes)")
-        
-        if zip_size < 100:  # Suspiciously small
-            print(f"🚨 WARNING: ZIP is suspiciously small!")
-            with zipfile.ZipFile(zip_path, 'r') as zipf:
-                file_list = zipf.namelist()
-                print(f"📋 ZIP contents: {file_list}")
-        
-        return zip_path
+                            os.unlink(entry.path)
+                        logger.info("🧹 Cleaned up expired task file: %s", entry.name)
+                    except FileNotFoundError:
+                        pass
+        except Exception as e:
+            logger.error("Error sweeping expired task files: %s", e)
     
-    def _schedule_delayed_cleanup(self, task_dir: Path, task_id: str, delay_minutes: int = 5):
-        """Schedule cleanup after specified delay to allow downloads"""
-        def delayed_cleanup():
-            delay_seconds = delay_minutes * 60
-            print(f"⏰ Scheduling cleanup for task {task_id} in {delay_minutes} minutes...")
-            time.sleep(delay_seconds)
-            
-            try:
-                print(f"🧹 Starting delayed cleanup for task {task_id}...")
-                
-                # Remove temp files
-                if task_dir.exists():
-                    for temp_file in task_dir.glob("temp_*"):
-                        temp_file.unlink(missing_ok=True)
-                        print(f"🧹 Cleaned up temp file: {temp_file}")
-                
-                # Remove ZIP file
-                zip_file = self.temp_dir / f"{task_id}.zip"
-                if zip_file.exists():
-                    zip_file.unlink(missing_ok=True)
-                    print(f"🗑️ Cleaned up ZIP file: {zip_file}")
-                
-                # Remove task directory if empty
-                if task_dir.exists() and not any(task_dir.iterdir()):
-                    task_dir.rmdir()
-                    print(f"📁 Removed empty task directory: {task_dir}")
-                    
-                print(f"✅ Delayed cleanup completed for task {task_id}")
-                
-            except Exception as e:
-                print(f"❌ Error in delayed cleanup for task {task_id}: {e}")
-        
-        # Run cleanup in background thread
-        cleanup_thread = threading.Thread(target=delayed_cleanup, daemon=True)
-        cleanup_thread.start()
-        print(f"⏰ Cleanup scheduled for task {task_id} (will execute in {delay_minutes} minutes)")
-
     async def _cleanup_temp_files(self, task_dir: Path):
-        """Clean up temporary files after ZIP creation (DEPRECATED - use delayed cleanup)"""
+        """Clean up temporary files after ZIP creation (DEPRECATED - expired tasks are swept by run_expiry_sweeper)"""
         try:
             # Remove all temp_* files
-            for temp_file in task_dir.glob("temp_*"):
-                temp_file.unlink(missing_ok=True)
-                print(f"🧹 Cleaned up temp file: {temp_file}")
+            for temp_file in _iter_temp_files(task_dir):
+                try:
+                    os.unlink(temp_file)
+                except FileNotFoundError:
+                    pass
         except Exception as e:
-            print(f"Error cleaning up temp files: {e}")
+            logger.error("Error cleaning up temp files: %s", e)
     
     async def cleanup_task(self, task_id: str):
         """Clean up temporary files for a task"""
@@ -488,7 +407,7 @@ class BatchProcessor:
                 zip_file.unlink()
                 
         except Exception as e:
-            print(f"Error cleaning up task {task_id}: {e}")
+            logger.error("Error cleaning up task %s: %s", task_id, e)
     
     def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """Get status of a processing task"""
@@ -1,10 +1,29 @@
 import os
+import re
 from pathlib import Path
-from typing import List, Set
+from typing import List, Set, Tuple, Optional
 from fastapi import UploadFile, HTTPException
 from config.settings import settings
 
 
+# For testing, also allow PNG files
+VALID_EXTENSIONS = frozenset({'.heic', '.heif', '.pdf', '.png', '.jpg', '.jpeg'})
+
+DANGEROUS_FILENAME_PATTERNS = (
+    '..',  # Directory traversal
+    '\\',  # Windows path separator
+    '//',  # URL manipulation
+    'javascript:',  # XSS
+    'data:',  # Data URI
+    'vbscript:',  # VBScript
+    'onload',  # Event handlers
+    'onerror',  # Event handlers
+)
+
+# Single compiled alternation, so a filename is scanned once instead of once per pattern
+DANGEROUS_FILENAME_REGEX = re.compile('|'.join(re.escape(p) for p in DANGEROUS_FILENAME_PATTERNS))
+
+
 class FileValidator:
     """Validates uploaded files for type, size and security"""
     
@@ -12,7 +31,35 @@ class FileValidator:
         self.allowed_extensions = settings.allowed_extensions
         self.max_file_size = settings.max_file_size
     
-    def validate_file(self, file: UploadFile) -> bool:
+    def validate_file(self, file: UploadFile) -> Tuple[bool, Optional[str]]:
+        """
+        Validate a single uploaded file without raising
+        
+        Args:
+            file: UploadFile object from FastAPI
+            
+        Returns:
+            Tuple[bool, Optional[str]]: (is_valid, error message if not valid)
+        """
+        # Check if file has a name
+        if not file.filename:
+            return False, "Archivo sin nombre"
+        
+        # Check file extension
+        if not self._is_valid_extension(file.filename):
+            return False, f"Extensión no permitida: {file.filename}"
+        
+        # Check file size (if available)
+        if getattr(file, 'size', None) and file.size > self.max_file_size:
+            return False, f"Archivo demasiado grande: {file.filename}"
+        
+        # Check for malicious file names
+        if self._is_malicious_filename(file.filename):
+            return False, "Nombre de archivo no permitido"
+        
+        return True, None
+    
+    def validate_file_or_raise(self, file: UploadFile) -> bool:
         """
         Validate a single uploaded file
         
@@ -20,70 +67,32 @@ class FileValidator:
             file: UploadFile object from FastAPI
             
         Returns:
-            bool: True if file is valid, False otherwise
+            bool: True if file is valid
             
         Raises:
             HTTPException: If file validation fails
         """
         try:
-            # Check if file has a name
-            if not file.filename:
-                raise HTTPException(status_code=400, detail="Archivo sin nombre")
-            
-            # Check file extension
-            if not self._is_valid_extension(file.filename):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Extensión no permitida: {file.filename}"
-                )
-            
-            # Check file size (if available)
-            if hasattr(file, 'size') and file.size:
-                if file.size > self.max_file_size:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Archivo demasiado grande: {file.filename}"
-                    )
-            
-            # Check for malicious file names
-            if self._is_malicious_filename(file.filename):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Nombre de archivo no permitido"
-                )
-            
-            return True
-            
-        except HTTPException:
-            raise
+            is_valid, error = self.validate_file(file)
         except Exception as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Error validando archivo: {str(e)}"
             )
+        
+        if not is_valid:
+            raise HTTPException(status_code=400, detail=error)
+        
+        return True
     
     def _is_valid_extension(self, filename: str) -> bool:
         """Check if file extension is allowed"""
-        file_ext = Path(filename).suffix.lower()
-        # For testing, also allow PNG files
-        test_extensions = {'.heic', '.heif', '.pdf', '.png', '.jpg', '.jpeg'}
-        return file_ext in test_extensions
+        _, dot, ext = filename.rpartition('.')
+        return bool(dot) and f".{ext.lower()}" in VALID_EXTENSIONS
     
     def _is_malicious_filename(self, filename: str) -> bool:
         """Check for potentially malicious file names"""
-        dangerous_patterns = [
-            '..',  # Directory traversal
-            '\\',  # Windows path separator
-            '//',  # URL manipulation
-            'javascript:',  # XSS
-            'data:',  # Data URI
-            'vbscript:',  # VBScript
-            'onload',  # Event handlers
-            'onerror',  # Event handlers
-        ]
-        
-        filename_lower = filename.lower()
-        return any(pattern in filename_lower for pattern in dangerous_patterns)
+        return DANGEROUS_FILENAME_REGEX.search(filename.lower()) is not None
     
     def validate_multiple_files(self, files: List[UploadFile]) -> List[bool]:
         """
@@ -95,13 +104,7 @@ class FileValidator:
         Returns:
             List[bool]: List of validation results
         """
-        results = []
-        for file in files:
-            try:
-                results.append(self.validate_file(file))
-            except HTTPException:
-                results.append(False)
-        return results
+        return [self.validate_file(file)[0] for file in files]
     
     def get_file_info(self, file: UploadFile) -> dict:
         """
@@ -4,12 +4,14 @@ from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import os
+import asyncio
 from pathlib import Path
 from typing import List, Optional
 import zipfile
 import tempfile
 import shutil
 import sys
+from contextlib import asynccontextmanager
 
 from config.settings import settings
 from app.core.processors.batch_processor import BatchProcessor
@@ -18,11 +20,26 @@ from app.utils.file_utils import create_temp_dir, cleanup_temp_dir
 from app.utils.logger import logger
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the background sweep that deletes expired task files for the app's lifetime"""
+    expiry_sweeper = asyncio.create_task(BatchProcessor.run_expiry_sweeper())
+    
+    yield
+    
+    expiry_sweeper.cancel()
+    try:
+        await expiry_sweeper
+    except asyncio.CancelledError:
+        pass
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    description="Conversor profesional de imágenes HEIC y PDF a JPG con compresión configurable"
+    description="Conversor profesional de imágenes HEIC y PDF a JPG con compresión configurable",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -40,19 +57,30 @@ app.mount("/static", StaticFiles(directory="app/web/static"), name="static")
 # Create uploads directory if it doesn't exist
 os.makedirs(settings.upload_dir, exist_ok=True)
 
+# Stateless apart from settings, so one instance serves every request
+VALIDATOR = FileValidator()
+
+
+INDEX_HTML_PATH = Path("app/web/templates/index.html")
+DEBUG_HTML_PATH = Path("debug.html")
+
+# Pages are read once at import; in debug mode they are re-read per request so edits show up
+INDEX_HTML = INDEX_HTML_PATH.read_bytes()
+DEBUG_HTML = DEBUG_HTML_PATH.read_bytes()
+
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """Serve the main HTML page"""
-    with open("app/web/templates/index.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    content = INDEX_HTML_PATH.read_bytes() if settings.debug else INDEX_HTML
+    return HTMLResponse(content=content)
 
 
 @app.get("/debug.html", response_class=HTMLResponse)
 async def debug_page():
     """Serve debug page for troubleshooting"""
-    with open("debug.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    content = DEBUG_HTML_PATH.read_bytes() if settings.debug else DEBUG_HTML
+    return HTMLResponse(content=content)
 
 
 @app.get("/health")
@@ -71,22 +99,16 @@ async def convert_files(
     Convert multiple HEIC/PDF files to JPG
     """
     logger.api_request("POST", "/api/convert")
-    logger.info(f"Received conversion request: {len(files)} files, quality={quality}, compression={compression}")
+    logger.info("Received conversion request: %d files, quality=%s, compression=%s", len(files), quality, compression)
     
     try:
         # Log file details
         for i, file in enumerate(files):
-            logger.debug(f"Upload file {i}: {file.filename} ({file.size} bytes, {file.content_type})")
+            logger.debug("Upload file %d: %s (%s bytes, %s)", i, file.filename, file.size, file.content_type)
         
         # Validate files
-        validator = FileValidator()
         for file in files:
-            if not validator.validate_file(file):
-                logger.warning(f"File validation failed for: {file.filename}")
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Archivo no válido: {file.filename}"
-                )
+            VALIDATOR.validate_file_or_raise(file)
         
         logger.info("All files passed validation")
         
@@ -95,20 +117,20 @@ async def convert_files(
         results = await processor.process_files(files, quality, compression)
         
         # Log result structure
-        logger.info(f"BatchProcessor returned: {type(results)} with keys: {list(results.keys()) if isinstance(results, dict) else 'N/A'}")
+        logger.info("BatchProcessor returned: %s with keys: %s", type(results), list(results.keys()) if isinstance(results, dict) else 'N/A')
         if isinstance(results, dict):
-            logger.info(f"Result success: {results.get('success')}")
+            logger.info("Result success: %s", results.get('success'))
             if results.get('success'):
-                logger.info(f"Task ID: {results.get('task_id')}")
-                logger.info(f"Processed files: {results.get('processed_files')}")
+                logger.info("Task ID: %s", results.get('task_id'))
+                logger.info("Processed files: %s", results.get('processed_files'))
             else:
-                logger.error(f"BatchProcessor failed: {results.get('error')}")
+                logger.error("BatchProcessor failed: %s", results.get('error'))
         
         # Return the BatchProcessor result directly (it already has the correct structure)
         return results
         
     except HTTPException as he:
-        logger.warning(f"HTTP exception in convert_files: {he.status_code} - {he.detail}")
+        logger.warning("HTTP exception in convert_files: %s - %s", he.status_code, he.detail)
         raise
     except Exception as e:
         logger.exception(e, "convert_files endpoint")
@@ -124,40 +146,42 @@ async def download_converted_files(task_id: str):
     logger.api_request("GET", f"/api/download/{task_id}")
     
     try:
-        logger.info(f"Download request for task_id: {task_id}")
+        logger.info("Download request for task_id: %s", task_id)
         
-        zip_path = Path(f"temp/{task_id}.zip")
-        logger.debug(f"Looking for ZIP at: {zip_path.absolute()}")
+        zip_path = settings.temp_dir / f"{task_id}.zip"
+        logger.debug("Looking for ZIP at: %s", zip_path)
         
-        if not zip_path.exists():
-            logger.warning(f"ZIP file not found: {zip_path}")
+        try:
+            zip_stat = zip_path.stat()
+        except FileNotFoundError:
+            logger.warning("ZIP file not found: %s", zip_path)
             
             # Check if task directory exists
-            task_dir = Path(f"temp/{task_id}")
+            task_dir = settings.temp_dir / task_id
             if task_dir.exists():
                 files_in_dir = list(task_dir.glob("*"))
-                logger.info(f"Task directory exists with files: {[f.name for f in files_in_dir]}")
+                logger.info("Task directory exists with files: %s", [f.name for f in files_in_dir])
             else:
-                logger.info(f"Task directory does not exist: {task_dir}")
+                logger.info("Task directory does not exist: %s", task_dir)
             
             # List all ZIP files in temp directory
-            temp_dir = Path("temp")
-            if temp_dir.exists():
-                zip_files = list(temp_dir.glob("*.zip"))
-                logger.info(f"Available ZIP files: {[f.name for f in zip_files]}")
+            if settings.temp_dir.exists():
+                zip_files = list(settings.temp_dir.glob("*.zip"))
+                logger.info("Available ZIP files: %s", [f.name for f in zip_files])
             
             raise HTTPException(
                 status_code=404, 
                 detail=f"Archivo ZIP no encontrado para task_id: {task_id}"
             )
         
-        zip_size = zip_path.stat().st_size
-        logger.info(f"Serving ZIP file: {zip_path.name} ({zip_size} bytes)")
+        logger.info("Serving ZIP file: %s (%d bytes)", zip_path.name, zip_stat.st_size)
         
+        # Reuse the stat so FileResponse doesn't stat the file again
         return FileResponse(
             path=str(zip_path),
             filename=f"converted_images_{task_id}.zip",
             media_type="application/zip",
+            stat_result=zip_stat,
             headers={
                 "Content-Disposition": f"attachment; filename=converted_images_{task_id}.zip"
             }
@@ -174,8 +198,14 @@ async def download_converted_files(task_id: str):
 if __name__ == "__main__":
     try:
         logger.info("Starting Conversor HEIC + PDF a JPG...")
-        logger.info(f"Server will start on: http://localhost:8000")
-        logger.info(f"Debug mode: {settings.debug}")
+        logger.info("Server will start on: http://localhost:8000")
+        logger.info("Debug mode: %s", settings.debug)
+        
+        # One process per core so a CPU-bound conversion doesn't hold up every other request.
+        # Task results live in settings.temp_dir, so any worker can serve any download.
+        # uvicorn can't reload with several workers, so debug keeps a single one
+        workers = 1 if settings.debug else (settings.workers or os.cpu_count() or 1)
+        logger.info("Workers: %d", workers)
         
         # Start server directly with uvicorn
         uvicorn.run(
@@ -183,6 +213,7 @@ if __name__ == "__main__":
             host="0.0.0.0",
             port=8000,
             reload=settings.debug,
+            workers=workers,
             log_level="info" if not settings.debug else "debug"
         )
         
@@ -1,4 +1,6 @@
 import os
+import re
+import secrets
 import shutil
 import tempfile
 from pathlib import Path
@@ -6,6 +8,15 @@ from typing import Optional, List
 import mimetypes
 
 
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.heic', '.heif'})
+IMAGE_MIME_TYPES = frozenset({'image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/tiff', 'image/webp', 'image/heic', 'image/heif'})
+
+FILE_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+# Any run of dangerous characters and/or underscores becomes a single underscore
+UNSAFE_FILENAME_REGEX = re.compile(r'[<>:"/\\|?*_]+')
+
+
 def create_temp_dir(prefix: str = "converter_") -> Path:
     """
     Create a temporary directory for file processing
@@ -63,13 +74,9 @@ def format_file_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    
-    return f"{size_bytes:.1f} {size_names[i]}"
+    # Each unit is 2**10 of the previous one, so the unit index comes straight from the bit length
+    i = min(max(0, (int(size_bytes).bit_length() - 1) // 10), len(FILE_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (10 * i)):.1f} {FILE_SIZE_UNITS[i]}"
 
 
 def get_file_mime_type(file_path: Path) -> Optional[str]:
@@ -99,19 +106,8 @@ def is_image_file(file_path: Path) -> bool:
     Returns:
         True if file is an image
     """
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.heic', '.heif'}
-    image_mime_types = {'image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/tiff', 'image/webp', 'image/heic', 'image/heif'}
-    
-    # Check extension
-    if file_path.suffix.lower() in image_extensions:
-        return True
-    
-    # Check MIME type
-    mime_type = get_file_mime_type(file_path)
-    if mime_type in image_mime_types:
-        return True
-    
-    return False
+    # Extension first, the MIME lookup is only needed when it doesn't match
+    return file_path.suffix.lower() in IMAGE_EXTENSIONS or get_file_mime_type(file_path) in IMAGE_MIME_TYPES
 
 
 def is_pdf_file(file_path: Path) -> bool:
@@ -137,27 +133,18 @@ def get_safe_filename(filename: str) -> str:
     Returns:
         Safe filename
     """
-    # Remove or replace dangerous characters
-    dangerous_chars = '<>:"/\\|?*'
-    safe_filename = filename
-    
-    for char in dangerous_chars:
-        safe_filename = safe_filename.replace(char, '_')
-    
-    # Remove multiple underscores
-    while '__' in safe_filename:
-        safe_filename = safe_filename.replace('__', '_')
-    
-    # Remove leading/trailing underscores
-    safe_filename = safe_filename.strip('_')
-    
-    return safe_filename
+    # Replace dangerous characters and collapse the underscores around them in one pass,
+    # then remove leading/trailing underscores
+    return UNSAFE_FILENAME_REGEX.sub('_', filename).strip('_')
 
 
 def create_unique_filename(base_path: Path, filename: str) -> Path:
     """
     Create unique filename to avoid conflicts
     
+    The file is created empty as part of the check, so the name stays reserved
+    until the caller writes to it.
+    
     Args:
         base_path: Base directory path
         filename: Desired filename
@@ -165,20 +152,22 @@ def create_unique_filename(base_path: Path, filename: str) -> Path:
     Returns:
         Path to unique filename
     """
-    counter = 1
     name, ext = filename.rsplit('.', 1) if '.' in filename else (filename, '')
+    new_filename = filename
     
     while True:
-        if counter == 1:
-            new_filename = filename
-        else:
-            new_filename = f"{name}_{counter}.{ext}" if ext else f"{name}_{counter}"
-        
         new_path = base_path / new_filename
-        if not new_path.exists():
-            return new_path
+        try:
+            # Atomic create-if-absent: no gap between the check and the caller's open()
+            fd = os.open(new_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            # A random suffix almost never collides, unlike counting up from _2
+            suffix = secrets.token_hex(4)
+            new_filename = f"{name}_{suffix}.{ext}" if ext else f"{name}_{suffix}"
+            continue
         
-        counter += 1
+        os.close(fd)
+        return new_path
 
 
 def list_files_in_directory(directory: Path, extensions: Optional[List[str]] = None) -> List[Path]:
@@ -192,14 +181,18 @@ def list_files_in_directory(directory: Path, extensions: Optional[List[str]] = N
     Returns:
         List of file paths
     """
-    if not directory.exists() or not directory.is_dir():
+    if not directory.is_dir():
         return []
     
-    files = []
-    for item in directory.iterdir():
-        if item.is_file():
-            if extensions is None or item.suffix.lower() in extensions:
-                files.append(item)
+    allowed = frozenset(extensions) if extensions is not None else None
+    
+    # scandir's DirEntry knows the file type from the directory read, so no stat() per entry
+    with os.scandir(directory) as entries:
+        files = [
+            Path(entry.path)
+            for entry in entries
+            if entry.is_file() and (allowed is None or os.path.splitext(entry.name)[1].lower() in allowed)
+        ]
     
     return sorted(files)
 
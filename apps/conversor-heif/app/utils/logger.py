@@ -1,9 +1,30 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from pathlib import Path
 from datetime import datetime
 import sys
 
+from config.settings import settings
+
+
+class LevelEmojiFormatter(logging.Formatter):
+    """Formatter that exposes a per-level emoji prefix as %(level_emoji)s"""
+    
+    LEVEL_EMOJI = {
+        "DEBUG": "🔍 ",
+        "INFO": "ℹ️  ",
+        "WARNING": "⚠️  ",
+        "ERROR": "❌ ",
+        "CRITICAL": "🚨 ",
+    }
+    
+    def format(self, record):
+        record.level_emoji = self.LEVEL_EMOJI.get(record.levelname, "")
+        return super().format(record)
+
 
 class Logger:
     """Centralized logging system for the application"""
@@ -25,19 +46,20 @@ class Logger:
         
         # Create logger
         self._logger = logging.getLogger("conversor")
-        self._logger.setLevel(logging.DEBUG)
+        # Below this level, records (and their %-style arguments) are dropped before any formatting
+        self._logger.setLevel(logging.DEBUG if settings.debug else settings.log_level.upper())
         
         # Clear existing handlers
         self._logger.handlers.clear()
         
         # Create formatters
-        detailed_formatter = logging.Formatter(
-            '%(asctime)s | %(levelname)-8s | %(filename)s:%(lineno)d | %(message)s',
+        detailed_formatter = LevelEmojiFormatter(
+            '%(asctime)s | %(levelname)-8s | %(filename)s:%(lineno)d | %(level_emoji)s%(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         
-        simple_formatter = logging.Formatter(
-            '%(asctime)s | %(levelname)-8s | %(message)s',
+        simple_formatter = LevelEmojiFormatter(
+            '%(asctime)s | %(levelname)-8s | %(level_emoji)s%(message)s',
             datefmt='%H:%M:%S'
         )
         
@@ -48,83 +70,92 @@ class Logger:
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(detailed_formatter)
-        self._logger.addHandler(file_handler)
         
         # Console handler - simpler logs
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(simple_formatter)
-        self._logger.addHandler(console_handler)
+        
+        # Callers only enqueue records; a background thread does the file and console writes,
+        # so logging never blocks the event loop on disk I/O
+        log_queue = queue.SimpleQueue()
+        self._logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        self._listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        self._listener.start()
+        # Flushes whatever is still queued on exit
+        atexit.register(self._listener.stop)
         
         # Log startup
         self._logger.info("="*60)
         self._logger.info("🚀 CONVERSOR HEIC + PDF a JPG - LOGGING STARTED")
-        self._logger.info(f"📂 Log file: {log_file}")
+        self._logger.info("📂 Log file: %s", log_file)
         self._logger.info("="*60)
     
-    def debug(self, message):
+    # The level emoji is added by the formatter, so these pass messages through untouched
+    def debug(self, message, *args):
         """Log debug message"""
-        self._logger.debug(f"🔍 {message}")
+        self._logger.debug(message, *args)
     
-    def info(self, message):
+    def info(self, message, *args):
         """Log info message"""
-        self._logger.info(f"ℹ️  {message}")
+        self._logger.info(message, *args)
     
-    def warning(self, message):
+    def warning(self, message, *args):
         """Log warning message"""
-        self._logger.warning(f"⚠️  {message}")
+        self._logger.warning(message, *args)
     
-    def error(self, message):
+    def error(self, message, *args):
         """Log error message"""
-        self._logger.error(f"❌ {message}")
+        self._logger.error(message, *args)
     
-    def critical(self, message):
+    def critical(self, message, *args):
         """Log critical message"""
-        self._logger.critical(f"🚨 {message}")
+        self._logger.critical(message, *args)
     
     def api_request(self, method, endpoint, status_code=None, duration=None):
         """Log API request"""
         if status_code and duration:
-            self._logger.info(f"🌐 {method} {endpoint} -> {status_code} ({duration:.2f}ms)")
+            self._logger.info("🌐 %s %s -> %s (%.2fms)", method, endpoint, status_code, duration)
         else:
-            self._logger.info(f"🌐 {method} {endpoint}")
+            self._logger.info("🌐 %s %s", method, endpoint)
     
     def file_operation(self, operation, file_path, success=True, details=None):
         """Log file operation"""
+        level = logging.INFO if success else logging.ERROR
         status = "✅" if success else "❌"
-        message = f"📁 {status} {operation}: {file_path}"
         if details:
-            message += f" ({details})"
-        
-        if success:
-            self._logger.info(message)
+            self._logger.log(level, "📁 %s %s: %s (%s)", status, operation, file_path, details)
         else:
-            self._logger.error(message)
+            self._logger.log(level, "📁 %s %s: %s", status, operation, file_path)
     
     def conversion_start(self, task_id, files_count, file_types):
         """Log conversion start"""
-        self._logger.info(f"🔄 CONVERSION START - Task: {task_id}")
-        self._logger.info(f"   📊 Files: {files_count} | Types: {file_types}")
+        self._logger.info("🔄 CONVERSION START - Task: %s", task_id)
+        self._logger.info("   📊 Files: %s | Types: %s", files_count, file_types)
     
     def conversion_end(self, task_id, success_count, total_count, duration=None):
         """Log conversion end"""
-        duration_str = f" in {duration:.2f}s" if duration else ""
-        self._logger.info(f"🏁 CONVERSION END - Task: {task_id}")
-        self._logger.info(f"   📊 Success: {success_count}/{total_count}{duration_str}")
+        self._logger.info("🏁 CONVERSION END - Task: %s", task_id)
+        if duration:
+            self._logger.info("   📊 Success: %s/%s in %.2fs", success_count, total_count, duration)
+        else:
+            self._logger.info("   📊 Success: %s/%s", success_count, total_count)
     
     def zip_creation(self, task_id, zip_path, file_count, size_bytes):
         """Log ZIP creation"""
-        size_mb = size_bytes / (1024 * 1024)
-        self._logger.info(f"📦 ZIP CREATED - Task: {task_id}")
-        self._logger.info(f"   📂 Path: {zip_path}")
-        self._logger.info(f"   📊 Files: {file_count} | Size: {size_mb:.2f}MB")
+        self._logger.info("📦 ZIP CREATED - Task: %s", task_id)
+        self._logger.info("   📂 Path: %s", zip_path)
+        self._logger.info("   📊 Files: %s | Size: %.2fMB", file_count, size_bytes / (1024 * 1024))
     
     def exception(self, exception, context=""):
         """Log exception with full traceback"""
-        import traceback
-        context_str = f" in {context}" if context else ""
-        self._logger.error(f"💥 EXCEPTION{context_str}: {type(exception).__name__} - {str(exception)}")
-        self._logger.debug(f"🔍 Full traceback:\n{traceback.format_exc()}")
+        # The traceback rides on the ERROR record, so it is kept whatever the configured level
+        self._logger.error(
+            "💥 EXCEPTION%s%s: %s - %s", " in " if context else "", context,
+            type(exception).__name__, exception, exc_info=exception
+        )
 
 
 # Global logger instance
@@ -2,7 +2,7 @@ import os
 import socket
 import signal
 import psutil
-from typing import Optional, List, Tuple
+from typing import Optional, List, Set, Tuple
 from pathlib import Path
 import time
 
@@ -26,9 +26,12 @@ class ServerManager:
             Available port number
         """
         start_port = start_port or self.default_port
+        listening = self.get_listening_ports()
         
         for port in range(start_port, start_port + 100):  # Try 100 ports
-            if self.is_port_available(port):
+            # Ports with a known listener are skipped without a probe; the rest are still
+            # confirmed with a bind, which also catches ports held by non-listening sockets
+            if port not in listening and self.is_port_available(port):
                 return port
         
         raise RuntimeError(f"No available ports found starting from {start_port}")
@@ -51,6 +54,23 @@ class ServerManager:
         except OSError:
             return False
     
+    def get_listening_ports(self) -> Set[int]:
+        """
+        Get the local TCP ports currently in LISTEN state, in a single system call
+        
+        Returns:
+            Set of port numbers (empty if the OS doesn't allow listing connections)
+        """
+        try:
+            return {
+                conn.laddr.port
+                for conn in psutil.net_connections(kind='tcp')
+                if conn.status == psutil.CONN_LISTEN and conn.laddr
+            }
+        except (psutil.AccessDenied, OSError):
+            # e.g. macOS without root; fall back to probing each port
+            return set()
+    
     def get_processes_using_port(self, port: int) -> List[Tuple[int, str]]:
         """
         Get list of processes using a specific port
@@ -63,6 +83,23 @@ class ServerManager:
         """
         processes = []
         
+        try:
+            # One system-wide connection table instead of walking every process's fds
+            pids = {
+                conn.pid
+                for conn in psutil.net_connections(kind='inet')
+                if conn.laddr and conn.laddr.port == port and conn.pid
+            }
+            for pid in pids:
+                try:
+                    processes.append((pid, psutil.Process(pid).name()))
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+            return processes
+        except (psutil.AccessDenied, OSError):
+            # e.g. macOS without root; fall back to scanning the processes we can see
+            pass
+        
         try:
             for proc in psutil.process_iter(['pid', 'name', 'connections']):
                 try:
@@ -2,6 +2,7 @@ from pydantic_settings import BaseSettings
 from pathlib import Path
 from typing import Optional
 import datetime
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -9,10 +10,16 @@ class Settings(BaseSettings):
     app_name: str = "Conversor HEIC a JPG"
     app_version: str = f"1.0.{int(datetime.datetime.now().timestamp())}"
     debug: bool = False
+    workers: Optional[int] = None  # Server processes for python -m app.main (defaults to CPU count, 1 in debug)
+    log_level: str = "INFO"  # Ignored (always DEBUG) when debug is on
     
     # File upload settings
     max_file_size: int = 100 * 1024 * 1024  # 100MB
+    max_in_memory_size: int = 32 * 1024 * 1024  # Larger batch uploads are spilled to disk before converting
     upload_dir: Path = Path("uploads")
+    # Batch work files and result ZIPs; the system temp dir is usually tmpfs instead of the container overlay
+    temp_dir: Path = Path(tempfile.gettempdir()) / "conversor-heif"
+    temp_retention_minutes: int = 5  # How long results stay available for download
     allowed_extensions: set = {".heic", ".heif", ".pdf"}
     
     # Image conversion settings
@@ -24,6 +31,10 @@ class Settings(BaseSettings):
     max_pdf_pages: int = 100
     max_images_per_page: int = 10
     
+    # Batch processing settings
+    max_concurrency: Optional[int] = None  # Files converted at once per worker (defaults to CPU count)
+    zip_compression: str = "store"  # "store" or "deflate"; outputs are already-compressed JPEGs
+    
     # Output settings
     output_format: str = "JPEG"
     output_extension: str = ".jpg"
@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+
+from app.core.validators.file_validator import FileValidator
+from config.settings import settings
+
+
+class TestFileValidator:
+    """Test cases for FileValidator class"""
+    
+    @pytest.fixture
+    def validator(self):
+        """Create a validator instance for testing"""
+        return FileValidator()
+    
+    def make_upload(self, filename, size=1024):
+        """Create a mock UploadFile"""
+        return Mock(filename=filename, size=size)
+    
+    def test_validate_file_valid(self, validator):
+        """Test that a valid file passes with no error message"""
+        assert validator.validate_file(self.make_upload("photo.HEIC")) == (True, None)
+    
+    def test_validate_file_unknown_size(self, validator):
+        """Test that a file without a reported size skips the size check"""
+        assert validator.validate_file(self.make_upload("doc.pdf", size=None)) == (True, None)
+    
+    @pytest.mark.parametrize("filename, size, message", [
+        ("", 1024, "Archivo sin nombre"),
+        ("notes.txt", 1024, "Extensión no permitida: notes.txt"),
+        ("noextension", 1024, "Extensión no permitida: noextension"),
+        ("big.pdf", settings.max_file_size + 1, "Archivo demasiado grande: big.pdf"),
+        ("..photo.heic", 1024, "Nombre de archivo no permitido"),
+        ("onload.jpg", 1024, "Nombre de archivo no permitido"),
+    ])
+    def test_validate_file_invalid(self, validator, filename, size, message):
+        """Test that each failing check returns its error message"""
+        assert validator.validate_file(self.make_upload(filename, size)) == (False, message)
+    
+    def test_validate_file_or_raise_valid(self, validator):
+        """Test that a valid file does not raise"""
+        assert validator.validate_file_or_raise(self.make_upload("photo.jpg")) is True
+    
+    @pytest.mark.parametrize("filename, size, message", [
+        ("", 1024, "Archivo sin nombre"),
+        ("notes.txt", 1024, "Extensión no permitida: notes.txt"),
+        ("big.pdf", settings.max_file_size + 1, "Archivo demasiado grande: big.pdf"),
+        ("onload.jpg", 1024, "Nombre de archivo no permitido"),
+    ])
+    def test_validate_file_or_raise_invalid(self, validator, filename, size, message):
+        """Test that a failing check raises HTTPException(400) with the same detail"""
+        with pytest.raises(HTTPException) as exc_info:
+            validator.validate_file_or_raise(self.make_upload(filename, size))
+        
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail == message
+    
+    def test_validate_multiple_files(self, validator):
+        """Test that multiple files are validated without raising"""
+        files = [self.make_upload("a.heic"), self.make_upload("b.txt"), self.make_upload("")]
+        assert validator.validate_multiple_files(files) == [True, False, False]
@@ -113,6 +113,23 @@ class TestHEICConverter:
                 assert result['output_size'] == 512
                 assert result['compression_ratio'] == 50.0
     
+    @pytest.mark.asyncio
+    async def test_convert_file_from_memory(self, converter, temp_dir):
+        """Test that converting in-memory data matches converting the file on disk"""
+        heic_path = temp_dir / "photo.heic"
+        Image.new('RGB', (64, 48), color='blue').save(heic_path, format="HEIF")
+        data = heic_path.read_bytes()
+        
+        from_path = await converter.convert_file(heic_path, temp_dir / "from_path.jpg", quality=80)
+        from_data = await converter.convert_file(heic_path, temp_dir / "from_data.jpg", quality=80, data=data)
+        
+        assert from_path['success'] is True
+        assert from_data['success'] is True
+        assert from_data['original_size'] == len(data) == from_path['original_size']
+        assert from_data['output_size'] == from_path['output_size']
+        assert from_data['output_dimensions'] == from_path['output_dimensions'] == (64, 48)
+        assert (temp_dir / "from_data.jpg").read_bytes() == (temp_dir / "from_path.jpg").read_bytes()
+    
     @pytest.mark.asyncio
     async def test_convert_file_rgba_conversion(self, converter, sample_image, temp_dir):
         """Test conversion of RGBA image to RGB - SIMPLIFIED"""
@@ -96,22 +96,23 @@ class TestPDFConverter:
             # Create mock pages
             mock_page1 = MagicMock()
             mock_page1.get_images.return_value = [
-                (1, 0, 0, 100, 100),  # xref, x0, y0, x1, y1
-                (2, 0, 0, 200, 200)
+                # xref, smask, width, height, bpc, colorspace, alt. colorspace, name, filter
+                (1, 0, 100, 100, 8, 'DeviceRGB', '', 'Im1', 'DCTDecode'),
+                (2, 0, 200, 200, 8, 'DeviceRGB', '', 'Im2', 'DCTDecode')
             ]
             
             mock_page2 = MagicMock()
             mock_page2.get_images.return_value = [
-                (3, 0, 0, 150, 150)
+                (3, 0, 150, 150, 8, 'DeviceRGB', '', 'Im3', 'DCTDecode')
             ]
             
             mock_doc.__getitem__.side_effect = [mock_page1, mock_page2]
             
             # Mock image extraction
             mock_doc.extract_image.side_effect = [
-                {"image": b"fake_image_data_1"},
-                {"image": b"fake_image_data_2"},
-                {"image": b"fake_image_data_3"}
+                {"image": b"fake_image_data_1", "ext": "jpeg", "colorspace": 3, "width": 100, "height": 100},
+                {"image": b"fake_image_data_2", "ext": "jpeg", "colorspace": 3, "width": 200, "height": 200},
+                {"image": b"fake_image_data_3", "ext": "jpeg", "colorspace": 3, "width": 150, "height": 150}
             ]
             
             # Mock the context manager properly
@@ -145,6 +146,55 @@ class TestPDFConverter:
                     assert result['total_images'] == 3
                     assert result['quality'] == 90
                     assert len(result['extracted_images']) == 3
+                    
+                    # Images are stored uncompressed straight into the ZIP
+                    import zipfile
+                    with zipfile.ZipFile(result['zip_path'], 'r') as zipf:
+                        assert zipf.namelist() == ["page_1a.jpg", "page_1b.jpg", "page_2a.jpg"]
+                        assert all(i.compress_type == zipfile.ZIP_STORED for i in zipf.infolist())
+    
+    def test_convert_page_image_jpeg_passthrough(self, converter, temp_dir):
+        """Test embedded RGB JPEGs are written without re-encoding"""
+        output_dir = temp_dir / "output"
+        filename = converter._generate_page_image_filename(1, 0, output_dir)
+        
+        mock_doc = MagicMock()
+        mock_doc.extract_image.return_value = {
+            "image": b"raw_jpeg_data",
+            "ext": "jpeg",
+            "colorspace": 3,
+            "width": 640,
+            "height": 480
+        }
+        
+        with patch('fitz.Pixmap') as mock_pixmap:
+            image, dimensions = converter._read_page_image(
+                mock_doc, (1, 0, 640, 480, 8, 'DeviceRGB', '', 'Im1', 'DCTDecode')
+            )
+            
+            mock_pixmap.assert_not_called()
+        
+        image_info, jpeg_bytes = converter._convert_page_image(image, dimensions, filename, 0, 0, 85)
+        
+        assert jpeg_bytes == b"raw_jpeg_data"
+        assert image_info['dimensions'] == (640, 480)
+        assert image_info['size'] == len(b"raw_jpeg_data")
+        assert filename.read_bytes() == b"raw_jpeg_data"
+    
+    def test_extract_images_from_page_limit(self, converter, temp_dir):
+        """Test images beyond the per-page limit are skipped"""
+        mock_page = MagicMock()
+        mock_page.get_images.return_value = [(i, 0, 0, 10, 10) for i in range(15)]
+        executor = MagicMock()
+        
+        with patch.object(converter, '_read_page_image', return_value=(b"", (10, 10))) as mock_read:
+            futures = converter._extract_images_from_page(
+                mock_page, 0, temp_dir / "output", 85, executor
+            )
+            
+            assert mock_read.call_count == converter.max_images_per_page
+        
+        assert len(futures) == converter.max_images_per_page
     
     @pytest.mark.asyncio
     async def test_extract_images_from_pdf_too_large(self, converter, sample_pdf, temp_dir):
@@ -210,37 +260,14 @@ class TestPDFConverter:
             assert result['error'] == "Test PDF error"
             assert result['error_type'] == "Exception"
     
-    @pytest.mark.asyncio
-    async def test_create_zip_file(self, converter, temp_dir):
-        """Test ZIP file creation"""
+    def test_get_zip_path(self, converter, temp_dir):
+        """Test ZIP path generation"""
         output_dir = temp_dir / "output"
-        output_dir.mkdir()
-        
-        # Create dummy image files
-        image1 = output_dir / "page_1a.jpg"
-        image2 = output_dir / "output_dir" / "page_2a.jpg"
-        image2.parent.mkdir()
-        
-        image1.touch()
-        image2.touch()
         
-        # Mock image info
-        images = [
-            {"path": str(image1), "filename": "page_1a.jpg"},
-            {"path": str(image2), "filename": "page_2a.jpg"}
-        ]
+        zip_path = converter._get_zip_path(output_dir, "test_pdf")
         
-        zip_path = await converter._create_zip_file(images, output_dir, "test_pdf")
-        
-        assert zip_path.exists()
+        assert zip_path.parent == output_dir
         assert zip_path.name == "test_pdf_extracted_images.zip"
-        
-        # Verify ZIP contents
-        import zipfile
-        with zipfile.ZipFile(zip_path, 'r') as zipf:
-            file_list = zipf.namelist()
-            assert "page_1a.jpg" in file_list
-            assert "page_2a.jpg" in file_list
 
 
 if __name__ == "__main__":